@@ -1,17 +1,29 @@
+from typing import TYPE_CHECKING, Optional
+
 from fastapi import APIRouter, Depends, HTTPException, status
-from supabase import Client, PostgrestAPIError
+from fastapi.responses import StreamingResponse
 
 from ..core.security import get_current_user
-from ..core.dependencies import get_supabase_client
+from ..core.dependencies import get_groq_client, get_milestone_engine, get_supabase_client, is_prefetch_request
 from ..models.models import (
     User,
     TopicRequest,
+    ActivityViewRequest,
+    QuizQuestion,
     QuizResponse,
+    Flashcard,
     FlashcardResponse,
     ExplanationResponse,
     DiscussionResponse,
+    ChatMessage,
+    ChatResponse,
 )
 from ..services import ai_service
+from ..services.milestone_service import ActivityEvent, MilestoneEngine
+
+if TYPE_CHECKING:
+    from groq import AsyncGroq
+    from supabase import AsyncClient
 
 router = APIRouter()
 
@@ -23,15 +35,33 @@ ACTIVITY_EXPLANATION = "explanation"
 ACTIVITY_DISCUSSION = "discussion"
 
 
-def _check_and_log_usage(
-    supabase: Client, current_user: User, topic: str, activity_type: str
+async def _check_and_log_usage(
+    supabase: "AsyncClient",
+    current_user: User,
+    topic: str,
+    activity_type: str,
+    milestones: MilestoneEngine,
+    prefetch: bool = False,
 ):
     """
     Checks user's usage against the free tier limit by calling a database function
     for atomicity. If the user is within the limit, it logs the new activity.
     If the limit is reached, it raises an HTTPException.
     Premium users are exempt from this check but their usage is still logged.
+    Logged activity (other than quizzes) is then published to the milestone engine.
+    Prefetches (premium only) log nothing: the activity is recorded through
+    /log_view if and when the user opens the prefetched content.
     """
+    from supabase import PostgrestAPIError
+
+    if prefetch:
+        if not current_user.is_premium:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Prefetching is only available to premium users.",
+            )
+        return
+
     # This logic is now handled atomically by a database function
     # to prevent race conditions.
     try:
@@ -43,13 +73,15 @@ def _check_and_log_usage(
             "p_topic": topic,
             "p_limit": FREE_TIER_LIMIT,
         }
-        can_perform_activity = supabase.rpc("can_and_log_activity", params).execute().data
+        can_perform_activity = (await supabase.rpc("can_and_log_activity", params).execute()).data
 
         if not can_perform_activity:
             raise HTTPException(
                 status_code=status.HTTP_402_PAYMENT_REQUIRED,
                 detail=f"You have reached the limit for free {activity_type} generations. Please upgrade to premium.",
             )
+    except HTTPException:
+        raise
     except PostgrestAPIError as e:
         # Handle specific database errors from Supabase/PostgREST
         # logger.error(f"Database error during usage check for user {current_user.id}: {e.message}")
@@ -65,53 +97,109 @@ def _check_and_log_usage(
             detail="An unexpected error occurred while verifying usage limits.",
         )
 
+    # Quizzes are counted towards milestones when their result is tracked, not when generated.
+    if activity_type != ACTIVITY_QUIZ:
+        milestones.publish(
+            ActivityEvent(user_id=str(current_user.id), activity_type=activity_type, topic=topic)
+        )
+
 
 @router.post("/generate_quiz", response_model=QuizResponse)
 async def generate_quiz(
     request: TopicRequest,
     current_user: User = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase_client),
+    supabase: "AsyncClient" = Depends(get_supabase_client),
+    groq: Optional["AsyncGroq"] = Depends(get_groq_client),
+    milestones: MilestoneEngine = Depends(get_milestone_engine),
+    prefetch: bool = Depends(is_prefetch_request),
 ):
     """
     Generates a quiz for a given topic.
     Free users can generate a limited number of quizzes. Premium users have no limit.
     """
-    _check_and_log_usage(supabase, current_user, request.topic, ACTIVITY_QUIZ)
+    await _check_and_log_usage(supabase, current_user, request.topic, ACTIVITY_QUIZ, milestones, prefetch)
 
-    quiz_data = await ai_service.generate_quiz_from_topic(request.topic)
-    return QuizResponse(**quiz_data)
+    quiz_data = await ai_service.generate_quiz_from_topic(groq, request.topic)
+    return QuizResponse(topic=request.topic, **quiz_data)
+
+
+@router.post("/generate_quiz/stream")
+async def generate_quiz_stream(
+    request: TopicRequest,
+    current_user: User = Depends(get_current_user),
+    supabase: "AsyncClient" = Depends(get_supabase_client),
+    groq: Optional["AsyncGroq"] = Depends(get_groq_client),
+    milestones: MilestoneEngine = Depends(get_milestone_engine),
+):
+    """
+    Streams a quiz as NDJSON, one QuizQuestion per line as soon as it is generated.
+    Counts against the same usage limit as /generate_quiz.
+    """
+    await _check_and_log_usage(supabase, current_user, request.topic, ACTIVITY_QUIZ, milestones)
+
+    stream = await ai_service.open_ai_json_stream(groq, ai_service.quiz_prompt(request.topic))
+    return StreamingResponse(
+        ai_service.stream_ai_json_items(stream, "questions", QuizQuestion),
+        media_type="application/x-ndjson",
+    )
 
 
 @router.post("/generate_flashcards", response_model=FlashcardResponse)
 async def generate_flashcards(
     request: TopicRequest,
     current_user: User = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase_client),
+    supabase: "AsyncClient" = Depends(get_supabase_client),
+    groq: Optional["AsyncGroq"] = Depends(get_groq_client),
+    milestones: MilestoneEngine = Depends(get_milestone_engine),
 ):
     """
     Generates flashcards for a given topic.
     Free users have a limit.
     """
-    _check_and_log_usage(supabase, current_user, request.topic, ACTIVITY_FLASHCARD)
+    await _check_and_log_usage(supabase, current_user, request.topic, ACTIVITY_FLASHCARD, milestones)
 
-    flashcard_data = await ai_service.generate_flashcards_from_topic(request.topic)
+    flashcard_data = await ai_service.generate_flashcards_from_topic(groq, request.topic)
     return FlashcardResponse(topic=request.topic, **flashcard_data)
 
 
+@router.post("/generate_flashcards/stream")
+async def generate_flashcards_stream(
+    request: TopicRequest,
+    current_user: User = Depends(get_current_user),
+    supabase: "AsyncClient" = Depends(get_supabase_client),
+    groq: Optional["AsyncGroq"] = Depends(get_groq_client),
+    milestones: MilestoneEngine = Depends(get_milestone_engine),
+):
+    """
+    Streams flashcards as NDJSON, one Flashcard per line as soon as it is generated.
+    Counts against the same usage limit as /generate_flashcards.
+    """
+    await _check_and_log_usage(supabase, current_user, request.topic, ACTIVITY_FLASHCARD, milestones)
+
+    stream = await ai_service.open_ai_json_stream(groq, ai_service.flashcards_prompt(request.topic))
+    return StreamingResponse(
+        ai_service.stream_ai_json_items(stream, "flashcards", Flashcard),
+        media_type="application/x-ndjson",
+    )
+
+
 @router.post("/generate_explanation", response_model=ExplanationResponse)
 async def generate_explanation(
     request: TopicRequest,
     current_user: User = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase_client),
+    supabase: "AsyncClient" = Depends(get_supabase_client),
+    groq: Optional["AsyncGroq"] = Depends(get_groq_client),
+    milestones: MilestoneEngine = Depends(get_milestone_engine),
+    prefetch: bool = Depends(is_prefetch_request),
 ):
     """
     Generates a detailed explanation for a given topic.
     Free users have a limit.
     """
-    _check_and_log_usage(supabase, current_user, request.topic, ACTIVITY_EXPLANATION)
+    await _check_and_log_usage(supabase, current_user, request.topic, ACTIVITY_EXPLANATION, milestones, prefetch)
 
     explanation_text = await ai_service.generate_explanation_from_topic(
-        request.topic
+        groq, request.topic
     )
     return ExplanationResponse(topic=request.topic, explanation=explanation_text)
 
@@ -120,13 +208,57 @@ async def generate_explanation(
 async def generate_discussion_points(
     request: TopicRequest,
     current_user: User = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase_client),
+    supabase: "AsyncClient" = Depends(get_supabase_client),
+    groq: Optional["AsyncGroq"] = Depends(get_groq_client),
+    milestones: MilestoneEngine = Depends(get_milestone_engine),
 ):
     """
     Generates discussion points for a given topic.
     Free users have a limit.
     """
-    _check_and_log_usage(supabase, current_user, request.topic, ACTIVITY_DISCUSSION)
+    await _check_and_log_usage(supabase, current_user, request.topic, ACTIVITY_DISCUSSION, milestones)
+
+    discussion_data = await ai_service.generate_discussion_from_topic(groq, request.topic)
+    return DiscussionResponse(topic=request.topic, **discussion_data)
+
+
+@router.post("/log_view", status_code=status.HTTP_204_NO_CONTENT)
+async def log_prefetched_view(
+    request: ActivityViewRequest,
+    current_user: User = Depends(get_current_user),
+    supabase: "AsyncClient" = Depends(get_supabase_client),
+    milestones: MilestoneEngine = Depends(get_milestone_engine),
+):
+    """
+    Records the activity for prefetched content the first time the user opens it,
+    exactly as if it had been generated on demand.
+    """
+    await _check_and_log_usage(supabase, current_user, request.topic, request.activity_type, milestones)
+
 
-    discussion_data = await ai_service.generate_discussion_from_topic(request.topic)
-    return DiscussionResponse(topic=request.topic, **discussion_data)
\ No newline at end of file
+@router.post("/start_discussion", response_model=ChatResponse)
+async def start_discussion(
+    request: TopicRequest,
+    current_user: User = Depends(get_current_user),
+    groq: Optional["AsyncGroq"] = Depends(get_groq_client),
+):
+    """
+    Opens a free-form discussion on a topic with an engaging question.
+    """
+    response_text = await ai_service.start_discussion_on_topic(groq, request.topic)
+    return ChatResponse(response=response_text)
+
+
+@router.post("/chat_response", response_model=ChatResponse)
+async def chat_response(
+    chat_message: ChatMessage,
+    current_user: User = Depends(get_current_user),
+    groq: Optional["AsyncGroq"] = Depends(get_groq_client),
+):
+    """
+    Continues a discussion using the chat history kept by the client.
+    """
+    response_text = await ai_service.continue_discussion(
+        groq, chat_message.message, chat_message.history
+    )
+    return ChatResponse(response=response_text)
@@ -0,0 +1,196 @@
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+
+from ..core.security import get_current_user
+from ..core.dependencies import get_groq_client, get_milestone_engine, get_supabase_client
+from ..models.models import (
+    User,
+    TopicRequest,
+    Flashcard,
+    DueCard,
+    DueCardsResponse,
+    ReviewBatchRequest,
+    ReviewBatchResponse,
+    DeckResponse,
+)
+from ..services import ai_service
+from ..services.milestone_service import MilestoneEngine
+from .content import ACTIVITY_FLASHCARD, _check_and_log_usage
+
+if TYPE_CHECKING:
+    from groq import AsyncGroq
+    from supabase import AsyncClient
+
+router = APIRouter()
+
+DUE_SESSION_SIZE = 20
+MAX_DUE_SESSION_SIZE = 100
+
+
+@router.get("/due", response_model=DueCardsResponse)
+async def get_due_flashcards(
+    limit: int = Query(DUE_SESSION_SIZE, ge=1, le=MAX_DUE_SESSION_SIZE),
+    deck_id: Optional[int] = None,
+    topic: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    supabase: "AsyncClient" = Depends(get_supabase_client),
+):
+    """
+    Returns the cards that are due for review, most overdue first, optionally
+    limited to one deck (by `deck_id` or by `topic`).
+    Served entirely from the database: each card's next due time is precomputed
+    when it is reviewed, so this is a single range scan on (user_id, due_at).
+    A topic is matched through an inner embed of the card's deck, so it is still
+    one round trip.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    columns = "id, deck_id, question, answer, due_at"
+    if topic is not None:
+        columns += ", flashcard_decks!inner(topic)"
+    query = (
+        supabase.table("flashcards")
+        .select(columns)
+        .eq("user_id", str(current_user.id))
+        .lte("due_at", now)
+    )
+    if deck_id is not None:
+        query = query.eq("deck_id", deck_id)
+    if topic is not None:
+        query = query.eq("flashcard_decks.topic", topic)
+    response = await query.order("due_at").limit(limit).execute()
+    return DueCardsResponse(cards=[DueCard(**row) for row in response.data or []])
+
+
+@router.post("/reviews", response_model=ReviewBatchResponse)
+async def submit_reviews(
+    request: ReviewBatchRequest,
+    current_user: User = Depends(get_current_user),
+    supabase: "AsyncClient" = Depends(get_supabase_client),
+):
+    """
+    Records a batch of review results. The SM-2 scheduling update is applied by
+    the `review_flashcards` database function in a single round trip.
+    """
+    # If a card was graded twice in one batch, only the latest grade counts.
+    grades = {review.card_id: review.grade for review in request.reviews}
+    params = {
+        "p_user_id": str(current_user.id),
+        "p_reviews": [{"card_id": card_id, "grade": grade} for card_id, grade in grades.items()],
+    }
+    reviewed = (await supabase.rpc("review_flashcards", params).execute()).data
+    return ReviewBatchResponse(reviewed=reviewed or 0)
+
+
+def _question_key(question: str) -> str:
+    return question.strip().lower()
+
+
+def _new_card_row(deck_id: int, current_user: User, card: Flashcard) -> dict:
+    # New cards get the default review state and are due immediately.
+    return {
+        "deck_id": deck_id,
+        "user_id": str(current_user.id),
+        "question": card.question,
+        "answer": card.answer,
+    }
+
+
+async def _prepare_deck_extension(supabase: "AsyncClient", current_user: User, topic: str):
+    """Creates the user's deck for a topic if needed; returns its id and current questions."""
+    deck_res = (
+        await supabase.table("flashcard_decks")
+        .upsert({"user_id": str(current_user.id), "topic": topic}, on_conflict="user_id,topic")
+        .execute()
+    )
+    if not deck_res.data:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not create the flashcard deck.",
+        )
+    deck_id = deck_res.data[0]["id"]
+
+    existing_res = (
+        await supabase.table("flashcards").select("question").eq("deck_id", deck_id).order("id").execute()
+    )
+    return deck_id, [row["question"] for row in existing_res.data or []]
+
+
+@router.post("/decks/extend", response_model=DeckResponse)
+async def extend_deck(
+    request: TopicRequest,
+    current_user: User = Depends(get_current_user),
+    supabase: "AsyncClient" = Depends(get_supabase_client),
+    groq: Optional["AsyncGroq"] = Depends(get_groq_client),
+    milestones: MilestoneEngine = Depends(get_milestone_engine),
+):
+    """
+    Adds newly generated cards to the user's deck for a topic, creating the deck
+    if needed. Together with /decks/extend/stream, this is the only flashcard
+    endpoint that calls the AI.
+    """
+    await _check_and_log_usage(supabase, current_user, request.topic, ACTIVITY_FLASHCARD, milestones)
+    deck_id, existing_questions = await _prepare_deck_extension(supabase, current_user, request.topic)
+
+    flashcard_data = await ai_service.generate_flashcards_from_topic(
+        groq, request.topic, exclude=existing_questions
+    )
+    seen = {_question_key(question) for question in existing_questions}
+    new_cards = []
+    for item in flashcard_data["flashcards"]:
+        try:
+            card = Flashcard(**item)
+        except (TypeError, ValidationError):
+            # Skip malformed AI output rather than failing after the usage was logged.
+            continue
+        if _question_key(card.question) in seen:
+            continue
+        seen.add(_question_key(card.question))
+        new_cards.append(_new_card_row(deck_id, current_user, card))
+
+    if new_cards:
+        await supabase.table("flashcards").insert(new_cards).execute()
+
+    return DeckResponse(
+        deck_id=deck_id,
+        topic=request.topic,
+        added=len(new_cards),
+        total=len(existing_questions) + len(new_cards),
+    )
+
+
+@router.post("/decks/extend/stream")
+async def extend_deck_stream(
+    request: TopicRequest,
+    current_user: User = Depends(get_current_user),
+    supabase: "AsyncClient" = Depends(get_supabase_client),
+    groq: Optional["AsyncGroq"] = Depends(get_groq_client),
+    milestones: MilestoneEngine = Depends(get_milestone_engine),
+):
+    """
+    Streams the cards added to the user's deck as NDJSON, one DueCard per line.
+    Each card is stored as soon as it is generated, so it can be graded before
+    the rest of the deck arrives. Counts against the same usage limit as /decks/extend.
+    """
+    await _check_and_log_usage(supabase, current_user, request.topic, ACTIVITY_FLASHCARD, milestones)
+    deck_id, existing_questions = await _prepare_deck_extension(supabase, current_user, request.topic)
+
+    stream = await ai_service.open_ai_json_stream(
+        groq, ai_service.flashcards_prompt(request.topic, exclude=existing_questions)
+    )
+    seen = {_question_key(question) for question in existing_questions}
+
+    async def store_card(card: Flashcard) -> Optional[DueCard]:
+        if _question_key(card.question) in seen:
+            return None
+        seen.add(_question_key(card.question))
+        inserted = await supabase.table("flashcards").insert(_new_card_row(deck_id, current_user, card)).execute()
+        return DueCard(**inserted.data[0])
+
+    return StreamingResponse(
+        ai_service.stream_ai_json_items(stream, "flashcards", Flashcard, on_item=store_card),
+        media_type="application/x-ndjson",
+    )
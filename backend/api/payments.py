@@ -1,11 +1,14 @@
+from typing import TYPE_CHECKING
+
 from fastapi import APIRouter, Depends, HTTPException, Request
-import httpx
 
 from ..core.config import settings
 from ..core.security import get_current_user
 from ..core.dependencies import get_supabase_client
 from ..models.models import User
-from supabase import Client
+
+if TYPE_CHECKING:
+    from supabase import AsyncClient
 
 router = APIRouter()
 
@@ -40,6 +43,8 @@ async def create_checkout_session(current_user: User = Depends(get_current_user)
         "webhook_url": webhook_url
     }
 
+    import httpx
+
     async with httpx.AsyncClient() as client:
         response = await client.post("https://api.instasend.com/v1/payment", headers=headers, json=payload)
 
@@ -50,7 +55,7 @@ async def create_checkout_session(current_user: User = Depends(get_current_user)
     return {"checkout_url": payment_data["payment_url"]}
 
 @router.post("/instasend_webhook")
-async def instasend_webhook(request: Request, supabase: Client = Depends(get_supabase_client)):
+async def instasend_webhook(request: Request, supabase: "AsyncClient" = Depends(get_supabase_client)):
     """
     Handles webhook notifications from InstaSend for successful payments.
     This endpoint must be publicly accessible and does not require user authentication.
@@ -65,10 +70,10 @@ async def instasend_webhook(request: Request, supabase: Client = Depends(get_sup
 
         if user_id:
             # 1. Update the user's profile to be premium
-            supabase.table('profiles').update({"is_premium": True}).eq('id', user_id).execute()
+            await supabase.table('profiles').update({"is_premium": True}).eq('id', user_id).execute()
 
             # 2. Log the payment in the payments table
-            supabase.table('payments').insert({
+            await supabase.table('payments').insert({
                 "user_id": user_id,
                 "instasend_payment_id": payment_info.get("id"),
                 "amount": payment_info.get("amount"),
@@ -1,12 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
-from typing import List
+from typing import TYPE_CHECKING, List, Literal, Optional
+import base64
+import binascii
+import json
 import logging
-from supabase import AsyncClient
-from gotrue.types import User
+from datetime import datetime
 
-from ..core.dependencies import get_supabase_client, get_current_user
-from ..models.models import QuizResultRequest
+from ..core.dependencies import get_milestone_engine, get_supabase_client
+from ..core.security import get_current_user
+from ..models.models import QuizResultRequest, User
+from ..services.milestone_service import ActivityEvent, MilestoneEngine
+
+if TYPE_CHECKING:
+    from supabase import AsyncClient
 
 router = APIRouter()
 logger = logging.getLogger("uvicorn")
@@ -25,16 +32,51 @@ class Milestone(BaseModel):
     milestone_description: str
     achieved_at: str
 
+class HistoryItem(BaseModel):
+    id: int
+    topic: str
+    activity_type: str
+    score: Optional[int] = None
+    total_questions: Optional[int] = None
+    created_at: str
+
+class HistoryPage(BaseModel):
+    items: List[HistoryItem]
+    # Opaque cursor for the next page, or None when there are no more rows.
+    next_cursor: Optional[str] = None
+
+HISTORY_PAGE_SIZE = 20
+HISTORY_MAX_PAGE_SIZE = 100
+HISTORY_COLUMNS = "id, topic, activity_type, score, total_questions, created_at"
+
+# --- Cursor helpers ---
+
+def _encode_history_cursor(row: dict) -> str:
+    """Encodes the (created_at, id) position of the last row on a page."""
+    raw = json.dumps([row["created_at"], row["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_history_cursor(cursor: str) -> tuple:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        # The cursor is client-controlled and ends up inside a PostgREST filter, so only a
+        # real timestamp (re-serialized by us) and an integer id are let through.
+        return datetime.fromisoformat(created_at).isoformat(), int(row_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor.")
+
 # --- API Endpoints ---
 
 @router.post("/track_quiz_result", status_code=201)
 async def track_quiz_result(
     request: QuizResultRequest,
     current_user: User = Depends(get_current_user),
-    supabase: AsyncClient = Depends(get_supabase_client)
+    supabase: "AsyncClient" = Depends(get_supabase_client),
+    milestones: MilestoneEngine = Depends(get_milestone_engine),
 ):
     """
-    Logs the result of a completed quiz, updates user progress, and checks for milestones.
+    Logs the result of a completed quiz, updates user progress, and queues a milestone check.
     """
     try:
         # 1. Log the raw quiz activity to the history table
@@ -49,7 +91,7 @@ async def track_quiz_result(
         # 2. Update the aggregated user_progress table
         # This is a read-modify-write operation. For high concurrency, a database
         # function or trigger would be more robust.
-        progress_res = await supabase.table('user_progress').select('*').eq('user_id', str(current_user.id)).eq('topic', request.topic).execute()
+        progress_res = await supabase.table('user_progress').select('id, total_quizzes, avg_score').eq('user_id', str(current_user.id)).eq('topic', request.topic).limit(1).execute()
         
         if progress_res.data:
             # Update existing progress for this topic
@@ -71,15 +113,15 @@ async def track_quiz_result(
                 'flashcards_studied': 0  # Default value
             }).execute()
 
-        # 3. Check for and award a milestone for the first perfect score
-        if request.score == request.total_questions:
-            existing = await supabase.table('milestones').select('id').eq('user_id', str(current_user.id)).eq('milestone_name', 'First Perfect Score').execute()
-            if not existing.data:
-                 await supabase.table('milestones').insert({
-                    "user_id": str(current_user.id),
-                    "milestone_name": "First Perfect Score",
-                    "milestone_description": f"Achieved a perfect score on the '{request.topic}' quiz!"
-                }).execute()
+        # 3. Hand the result to the milestone engine; rules are evaluated off the request path
+        milestones.publish(ActivityEvent(
+            user_id=str(current_user.id),
+            activity_type="quiz",
+            topic=request.topic,
+            completed_quiz=True,
+            score=request.score,
+            total_questions=request.total_questions,
+        ))
 
         return {"message": "Quiz result tracked successfully."}
     except Exception as e:
@@ -89,7 +131,7 @@ async def track_quiz_result(
 @router.get("/progress", response_model=ProgressStats)
 async def get_user_progress_summary(
     current_user: User = Depends(get_current_user),
-    supabase: AsyncClient = Depends(get_supabase_client)
+    supabase: "AsyncClient" = Depends(get_supabase_client)
 ):
     """
     Fetches and aggregates user progress across all topics.
@@ -121,7 +163,7 @@ async def get_user_progress_summary(
 @router.get("/milestones", response_model=List[Milestone])
 async def get_user_milestones(
     current_user: User = Depends(get_current_user),
-    supabase: AsyncClient = Depends(get_supabase_client)
+    supabase: "AsyncClient" = Depends(get_supabase_client)
 ):
     """
     Fetches all milestones achieved by the current user.
@@ -132,4 +174,42 @@ async def get_user_milestones(
         return [Milestone(**item) for item in response.data]
     except Exception as e:
         logger.error(f"Error fetching milestones for user {current_user.id}: {e}")
-        raise HTTPException(status_code=500, detail="An error occurred while fetching milestones.")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="An error occurred while fetching milestones.")
+
+@router.get("/history", response_model=HistoryPage)
+async def get_user_history(
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    activity_type: Optional[Literal["quiz", "flashcard", "explanation", "discussion"]] = None,
+    topic: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    supabase: "AsyncClient" = Depends(get_supabase_client)
+):
+    """
+    Returns the user's activity history, newest first, one page at a time.
+    Uses keyset pagination on (created_at, id): each page seeks into the
+    (user_id, ..., created_at desc, id desc) index at the cursor and reads at most
+    `limit + 1` rows from there, so deep pages cost the same as the first one.
+    """
+    query = supabase.table("history").select(HISTORY_COLUMNS).eq("user_id", str(current_user.id))
+    if activity_type:
+        query = query.eq("activity_type", activity_type)
+    if topic:
+        query = query.eq("topic", topic)
+    if cursor:
+        created_at, row_id = _decode_history_cursor(cursor)
+        # Rows strictly after the cursor in (created_at desc, id desc) order. The plain
+        # upper bound is what lets Postgres start the index scan at the cursor (an OR alone
+        # can't bound the range); the OR then only drops the ties already shown.
+        query = query.lte("created_at", created_at).or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{row_id})')
+
+    try:
+        # Fetch one extra row to find out whether another page exists.
+        response = await query.order("created_at", desc=True).order("id", desc=True).limit(limit + 1).execute()
+    except Exception as e:
+        logger.error(f"Error fetching history for user {current_user.id}: {e}")
+        raise HTTPException(status_code=500, detail="An error occurred while fetching history.")
+
+    rows = response.data or []
+    next_cursor = _encode_history_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return HistoryPage(items=[HistoryItem(**row) for row in rows[:limit]], next_cursor=next_cursor)
@@ -0,0 +1,146 @@
+"""
+Measures cold-start latency of the API the way a scale-to-zero host sees it.
+
+Each run starts a fresh interpreter and records:
+  - import:        importing backend.main (which builds the app via create_app)
+  - startup:       running the lifespan startup
+  - first request: the first authenticated request that needs the Supabase and
+                   Groq clients, sent right after startup (so it races the warm-up)
+  - sdk warm-up:   time from startup until the background warm-up task has
+                   imported the SDKs and built both clients
+  - loop stall:    the longest the event loop was unable to run anything else
+                   over that period (e.g. an SDK import done on the loop)
+
+Placeholder credentials are used and authentication is stubbed, so the clients
+are built as in production but nothing is sent to Supabase or Groq.
+
+Run from the repository root:
+
+    python -m backend.benchmarks.cold_start --runs 10
+    python -m backend.benchmarks.cold_start --importtime   # slowest imports of backend.main
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Executed in a fresh interpreter per run so nothing is already imported or cached.
+_MEASURE_SNIPPET = r"""
+import asyncio, json, time, uuid
+
+t0 = time.perf_counter()
+import backend.main
+t_import = time.perf_counter() - t0
+
+import httpx
+from fastapi import Depends
+from backend.core.config import Settings
+from backend.core.dependencies import get_groq_client, get_supabase_client
+from backend.core.security import get_current_user
+from backend.models.models import User
+
+settings = Settings(
+    SUPABASE_URL="http://127.0.0.1:9", SUPABASE_SERVICE_KEY="bench.bench.bench", GROQ_API_KEY="bench"
+)
+app = backend.main.create_app(settings)
+
+# Resolves the same dependencies as the real endpoints, without their network calls.
+@app.post("/api/bench/first_request")
+async def first_request(
+    user: User = Depends(get_current_user),
+    supabase=Depends(get_supabase_client),
+    groq=Depends(get_groq_client),
+):
+    assert supabase is not None and groq is not None
+    return {"user_id": str(user.id)}
+
+app.dependency_overrides[get_current_user] = lambda: User(id=uuid.uuid4(), email="bench@example.com")
+
+async def watch_loop(stalls):
+    # Sleeps 1 ms at a time; any longer gap is time the loop spent blocked.
+    while True:
+        before = time.perf_counter()
+        await asyncio.sleep(0.001)
+        stalls.append(time.perf_counter() - before - 0.001)
+
+async def measure():
+    stalls = [0.0]
+    watcher = asyncio.create_task(watch_loop(stalls))
+    await asyncio.sleep(0)
+    t0 = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        t_startup = time.perf_counter() - t0
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            t1 = time.perf_counter()
+            response = await client.post("/api/bench/first_request")
+            t_first = time.perf_counter() - t1
+            assert response.status_code == 200, response.text
+        await app.state.warm_up
+        t_warm = time.perf_counter() - t0
+    watcher.cancel()
+    return t_startup, t_first, t_warm, max(stalls)
+
+t_startup, t_first, t_warm, t_stall = asyncio.run(measure())
+print(json.dumps({
+    "import": t_import * 1000,
+    "startup": t_startup * 1000,
+    "first request": t_first * 1000,
+    "sdk warm-up": t_warm * 1000,
+    "loop stall": t_stall * 1000,
+}))
+"""
+
+METRICS = ("import", "startup", "first request", "sdk warm-up", "loop stall")
+
+
+def run_once() -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", _MEASURE_SNIPPET], capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def report(runs: int) -> None:
+    samples = [run_once() for _ in range(runs)]
+    print(f"Cold start over {runs} fresh interpreters (ms)")
+    print(f"{'metric':<15}{'median':>10}{'min':>10}{'max':>10}")
+    for metric in METRICS:
+        values = [sample[metric] for sample in samples]
+        print(f"{metric:<15}{statistics.median(values):>10.1f}{min(values):>10.1f}{max(values):>10.1f}")
+
+
+def report_import_time(limit: int) -> None:
+    """Prints the modules with the largest cumulative import time under backend.main."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import backend.main"],
+        capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        # Format: "import time:  <self us> | <cumulative us> | <indented module>"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), module.strip()))
+    print("Slowest imports for backend.main (cumulative ms)")
+    for cumulative_us, module in sorted(rows, reverse=True)[:limit]:
+        print(f"{cumulative_us / 1000:>10.1f}  {module}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="number of fresh interpreters to measure")
+    parser.add_argument("--importtime", action="store_true", help="list the slowest imports instead")
+    parser.add_argument("--limit", type=int, default=15, help="rows to show with --importtime")
+    args = parser.parse_args()
+
+    if args.importtime:
+        report_import_time(args.limit)
+    else:
+        report(args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import asyncio
+import importlib
+import logging
+from typing import TYPE_CHECKING, Optional
+
+from .config import Settings
+
+if TYPE_CHECKING:
+    from groq import AsyncGroq
+    from supabase import AsyncClient
+
+logger = logging.getLogger("uvicorn")
+
+# Imported in the background after startup so they are ready before they're needed
+HEAVY_SDK_MODULES = ("supabase", "groq")
+
+
+async def _import_sdk(module: str):
+    """
+    Imports an SDK in a worker thread so the event loop keeps serving requests.
+    Concurrent imports of the same module (e.g. by a request during warm-up)
+    wait on Python's import lock in their own thread and share the result.
+    """
+    return await asyncio.to_thread(importlib.import_module, module)
+
+
+def _build_supabase_client(supabase, url: str, key: str) -> "AsyncClient":
+    """
+    Builds the client the way `acreate_client` does for a service key: its only async
+    step copies headers from a stored user session, which a server never has.
+    Constructing it loads TLS certificates and lazily imports the HTTP stack, so this
+    runs in a worker thread. The PostgREST client, otherwise built on the first
+    query, is created here as well.
+    """
+    client = supabase.AsyncClient(url, key)
+    client.postgrest
+    return client
+
+
+class Clients:
+    """
+    The SDK clients shared by every request, created once per process.
+
+    The groq and supabase packages are only imported when a client is first
+    requested (or by `warm_up`), so importing the app and starting the server
+    does not pay for them. Those imports always run off the event loop.
+    """
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self._supabase: Optional["AsyncClient"] = None
+        self._groq: Optional["AsyncGroq"] = None
+        self._supabase_lock = asyncio.Lock()
+        self._groq_lock = asyncio.Lock()
+
+    async def get_supabase(self) -> "AsyncClient":
+        if self._supabase is None:
+            async with self._supabase_lock:
+                if self._supabase is None:
+                    if not self.settings.SUPABASE_URL or not self.settings.SUPABASE_SERVICE_KEY:
+                        raise RuntimeError("SUPABASE_URL and SUPABASE_SERVICE_KEY must be set in .env file")
+                    supabase = await _import_sdk("supabase")
+                    self._supabase = await asyncio.to_thread(
+                        _build_supabase_client, supabase, self.settings.SUPABASE_URL, self.settings.SUPABASE_SERVICE_KEY
+                    )
+        return self._supabase
+
+    async def get_groq(self) -> Optional["AsyncGroq"]:
+        """Returns the Groq client, or None when GROQ_API_KEY is not configured."""
+        if self._groq is None and self.settings.GROQ_API_KEY:
+            async with self._groq_lock:
+                if self._groq is None:
+                    groq = await _import_sdk("groq")
+                    # Building the client loads the TLS certificate store, which is slow too.
+                    self._groq = await asyncio.to_thread(groq.AsyncGroq, api_key=self.settings.GROQ_API_KEY)
+        return self._groq
+
+    async def warm_up(self) -> None:
+        """
+        Imports the heavy SDKs in a worker thread and builds the clients, so the
+        first request that needs them doesn't have to. Failures are only logged;
+        the clients are created on demand instead.
+        """
+        try:
+            for module in HEAVY_SDK_MODULES:
+                await _import_sdk(module)
+            await self.get_groq()
+            if self.settings.SUPABASE_URL and self.settings.SUPABASE_SERVICE_KEY:
+                await self.get_supabase()
+        except Exception as e:
+            logger.warning(f"Client warm-up failed, clients will be created on first use: {e}")
+
+    async def aclose(self) -> None:
+        """Closes the HTTP connection pools of the clients that were created."""
+        if self._groq is not None:
+            await self._groq.close()
+        if self._supabase is not None:
+            # The API only uses the PostgREST and auth sub-clients, each with its own pool.
+            await self._supabase.postgrest.aclose()
+            await self._supabase.auth.close()
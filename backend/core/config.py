@@ -1,16 +1,33 @@
-from pydantic_settings import BaseSettings
-from dotenv import load_dotenv
 import os
+from typing import Optional
+
+from pydantic import AliasChoices, Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-load_dotenv()
 
 class Settings(BaseSettings):
-    SUPABASE_URL: str = os.environ.get("SUPABASE_URL")
-    SUPABASE_SERVICE_KEY: str = os.environ.get("SUPABASE_SERVICE_KEY")
-    HF_API_KEY: str = os.environ.get("HF_API_KEY")
-    INSTASEND_API_KEY: str = os.environ.get("INSTASEND_API_KEY")
-    INSTASEND_WALLET_ID: str = os.environ.get("INSTASEND_WALLET_ID")
-    FRONTEND_URL: str = os.environ.get("FRONTEND_URL", "http://localhost:5500")
+    """
+    The single source of configuration. Values come from the environment, then
+    from backend/.env (or a .env in the repository root for older setups).
+    """
+
+    model_config = SettingsConfigDict(
+        env_file=(os.path.join(BACKEND_DIR, "..", ".env"), os.path.join(BACKEND_DIR, ".env")),
+        extra="ignore",
+    )
+
+    SUPABASE_URL: Optional[str] = None
+    # The backend should use the service role key; SUPABASE_KEY is accepted for older .env files.
+    SUPABASE_SERVICE_KEY: Optional[str] = Field(
+        default=None, validation_alias=AliasChoices("SUPABASE_SERVICE_KEY", "SUPABASE_KEY")
+    )
+    GROQ_API_KEY: Optional[str] = None
+    HF_API_KEY: Optional[str] = None
+    INSTASEND_API_KEY: Optional[str] = None
+    INSTASEND_WALLET_ID: Optional[str] = None
+    FRONTEND_URL: str = "http://localhost:5500"
 
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
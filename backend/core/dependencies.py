@@ -1,53 +1,39 @@
-from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
-from supabase import create_client, AsyncClient
-from gotrue.types import User
-import os
-from dotenv import load_dotenv
+from typing import TYPE_CHECKING, Optional
 
-# Load environment variables from .env file in the root directory
-# The path is relative to this file's location (backend/core/dependencies.py)
-dotenv_path = os.path.join(os.path.dirname(__file__), '..', '..', '.env')
-if os.path.exists(dotenv_path):
-    load_dotenv(dotenv_path=dotenv_path)
+from fastapi import HTTPException, Request, status
 
+if TYPE_CHECKING:
+    from groq import AsyncGroq
+    from supabase import AsyncClient
 
-# Define the OAuth2 scheme. The tokenUrl should point to your login endpoint.
-# This is a placeholder; you might need to adjust it to your actual auth router.
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token")
+    from ..services.milestone_service import MilestoneEngine
 
-async def get_supabase_client() -> AsyncClient:
+
+async def get_supabase_client(request: Request) -> "AsyncClient":
     """
-    Provides an asynchronous Supabase client instance as a dependency.
-    It reads the URL and Key from environment variables.
+    Provides the shared asynchronous Supabase client as a dependency.
+    The client is created once by the application's Clients holder.
     """
-    url: str = os.environ.get("SUPABASE_URL")
-    key: str = os.environ.get("SUPABASE_KEY")
+    try:
+        return await request.app.state.clients.get_supabase()
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+
 
-    if not url or not key:
-        # This will prevent the server from starting if the keys are missing,
-        # which is good for catching configuration errors early.
-        raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in .env file")
+async def get_groq_client(request: Request) -> Optional["AsyncGroq"]:
+    """Provides the shared Groq client, or None if GROQ_API_KEY is not configured."""
+    return await request.app.state.clients.get_groq()
 
-    return await create_client(url, key)
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    supabase: AsyncClient = Depends(get_supabase_client)
-) -> User:
+def get_milestone_engine(request: Request) -> "MilestoneEngine":
+    """Provides the application's milestone engine, started in the lifespan."""
+    return request.app.state.milestone_engine
+
+
+def is_prefetch_request(request: Request) -> bool:
     """
-    Dependency to get the current authenticated user from a JWT token.
-    This protects endpoints by requiring a valid token.
+    Whether the client marked the request as a speculative prefetch, with
+    `Purpose: prefetch` (or the browser's own `Sec-Purpose: prefetch`).
     """
-    try:
-        user_response = await supabase.auth.get_user(token)
-        user = user_response.user
-        if not user:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid authentication credentials")
-        return user
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=f"Could not validate credentials: {e}",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
\ No newline at end of file
+    purpose = request.headers.get("purpose") or request.headers.get("sec-purpose") or ""
+    return purpose.split(";")[0].strip().lower() == "prefetch"
@@ -0,0 +1,332 @@
+import base64
+import binascii
+import gzip
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:  # Brotli is optional; without it only gzip is offered.
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+
+# Responses smaller than this are sent uncompressed; the framing overhead isn't worth it.
+COMPRESSION_MINIMUM_SIZE = 500
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # Good ratio while staying fast enough for dynamic responses
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript")
+
+# Every cached response must be revalidated, and only the user's own browser may store it.
+DEFAULT_CACHE_CONTROL = "private, no-cache"
+
+# How long the ETag of a generated response stays valid for revalidation. This has to be
+# much longer than the frontend cache's fresh window (24h), because clients only send
+# If-None-Match once their copy has gone stale.
+GENERATION_ETAG_TTL_SECONDS = 30 * 24 * 60 * 60
+MAX_REMEMBERED_ETAGS = 50_000
+
+
+async def _read_body(receive: Receive) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body", False):
+            return body
+
+
+def _etag_for(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def _caller_id(authorization: str) -> str:
+    """
+    Returns the user id (`sub` claim) of a bearer token, or the raw header if it isn't a JWT.
+    Supabase rotates access tokens about hourly, so keying on the token itself would
+    forget every ETag at the next refresh. The signature isn't checked here: the id only
+    selects a remembered ETag, and a 304 is only sent to a caller presenting that exact
+    ETag, i.e. one who already holds the content.
+    """
+    token = authorization.removeprefix("Bearer ").strip()
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return str(claims["sub"])
+    except (IndexError, KeyError, TypeError, ValueError, binascii.Error):
+        return authorization
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+class _BufferedResponse:
+    """
+    Collects the start and body messages of a response so middleware can inspect
+    the complete body. Streaming responses (more than one body message) are
+    detected on the first chunk and forwarded unchanged.
+    """
+
+    def __init__(self, send: Send):
+        self.send = send
+        self.start: Optional[Message] = None
+        self.body: Optional[bytes] = None
+        self.streaming = False
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.streaming:
+            await self.send(message)
+            return
+        if message.get("more_body", False) and self.body is None:
+            # Streaming response: release the held start message and stop buffering.
+            self.streaming = True
+            await self.send(self.start)
+            await self.send(message)
+            return
+        self.body = (self.body or b"") + message.get("body", b"")
+
+
+class ETagMiddleware:
+    """
+    Adds strong ETags and Cache-Control to complete 200 responses and answers
+    matching If-None-Match requests with 304 Not Modified.
+
+    GET requests are validated against the body the endpoint just produced.
+
+    POST requests to `revalidate_paths` (the AI generation endpoints) follow a
+    conditional-revalidation contract: the ETag of each generated response is
+    remembered per user, path and request body for `ttl_seconds`. A client
+    holding that copy can send it back in If-None-Match and receives a 304
+    without the endpoint running, so no AI call is made and no usage is logged.
+
+    The remembered ETags live in this process's memory only. They are not shared
+    between workers or instances and are lost on restart. A miss just means the
+    endpoint runs and generates fresh content, as it would without this middleware.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        revalidate_paths: Iterable[str] = (),
+        ttl_seconds: int = GENERATION_ETAG_TTL_SECONDS,
+        max_entries: int = MAX_REMEMBERED_ETAGS,
+    ):
+        self.app = app
+        self.revalidate_paths = frozenset(revalidate_paths)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._issued: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        if method == "GET":
+            await self._handle(scope, receive, send, revalidation_key=None)
+        elif method == "POST" and scope["path"] in self.revalidate_paths:
+            await self._handle_generation(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+    async def _handle_generation(self, scope: Scope, receive: Receive, send: Send) -> None:
+        request_body = await _read_body(receive)
+        headers = Headers(scope=scope)
+        key = hashlib.sha256(
+            b"\0".join([scope["path"].encode(), _caller_id(headers.get("authorization", "")).encode(), request_body])
+        ).hexdigest()
+
+        # Only an exact tag counts here, not "*": the caller id isn't verified, so a 304
+        # must not reveal anything to someone who doesn't already hold the content.
+        client_tags = [tag.strip() for tag in headers.get("if-none-match", "").split(",")]
+        issued = self._issued.get(key)
+        if issued and issued[1] > time.monotonic() and issued[0] in client_tags:
+            await self._send_not_modified(send, issued[0], DEFAULT_CACHE_CONTROL)
+            return
+
+        replayed = False
+
+        async def replay() -> Message:
+            nonlocal replayed
+            if replayed:
+                return await receive()
+            replayed = True
+            return {"type": "http.request", "body": request_body, "more_body": False}
+
+        await self._handle(scope, replay, send, revalidation_key=key)
+
+    async def _handle(self, scope: Scope, receive: Receive, send: Send, revalidation_key: Optional[str]) -> None:
+        buffered = _BufferedResponse(send)
+        await self.app(scope, receive, buffered)
+        if buffered.streaming:
+            return
+        if buffered.start is None:
+            return
+
+        body = buffered.body or b""
+        headers = MutableHeaders(raw=buffered.start["headers"])
+        if buffered.start["status"] != 200 or "content-encoding" in headers:
+            await send(buffered.start)
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        etag = headers.get("etag") or _etag_for(body)
+        headers["etag"] = etag
+        if "cache-control" not in headers:
+            headers["cache-control"] = DEFAULT_CACHE_CONTROL
+
+        if revalidation_key is not None:
+            self._remember(revalidation_key, etag)
+        elif _etag_matches(Headers(scope=scope).get("if-none-match"), etag):
+            await self._send_not_modified(send, etag, headers["cache-control"])
+            return
+
+        await send(buffered.start)
+        await send({"type": "http.response.body", "body": body})
+
+    def _remember(self, key: str, etag: str) -> None:
+        self._issued[key] = (etag, time.monotonic() + self.ttl_seconds)
+        self._issued.move_to_end(key)
+        while len(self._issued) > self.max_entries:
+            self._issued.popitem(last=False)
+
+    @staticmethod
+    async def _send_not_modified(send: Send, etag: str, cache_control: str) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": 304,
+            "headers": [(b"etag", etag.encode()), (b"cache-control", cache_control.encode())],
+        })
+        await send({"type": "http.response.body", "body": b""})
+
+
+def _choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Picks br or gzip from an Accept-Encoding header, honouring q=0."""
+    offered = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        offered[name.strip().lower()] = quality
+    if brotli is not None and offered.get("br", 0) > 0:
+        return "br"
+    if offered.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Compresses complete responses with brotli (when installed) or gzip.
+    Small bodies, non-text content types, already-encoded and streaming
+    responses are sent as is, so NDJSON streams are never held back.
+
+    Encoded responses get an encoding-specific ETag suffix (e.g. "abc-gzip"),
+    which is stripped again from If-None-Match on the way in. A 304 gets back the
+    exact tag the client sent, so it matches the ETag of the 200 it revalidates.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        encoding = _choose_encoding(request_headers.get("accept-encoding", ""))
+        client_tags = [tag.strip() for tag in request_headers.get("if-none-match", "").split(",")]
+        scope = self._strip_etag_suffixes(scope, request_headers)
+
+        # Every message below goes through this wrapper, so 304s carry the tag as the client sent it.
+        downstream_send = send
+
+        async def send(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] == 304:
+                headers = MutableHeaders(raw=message["headers"])
+                etag = headers.get("etag")
+                if etag:
+                    headers["etag"] = self._as_sent_by_client(etag, client_tags)
+            await downstream_send(message)
+
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        buffered = _BufferedResponse(send)
+        await self.app(scope, receive, buffered)
+        if buffered.streaming or buffered.start is None:
+            return
+
+        body = buffered.body or b""
+        headers = MutableHeaders(raw=buffered.start["headers"])
+        headers.add_vary_header("Accept-Encoding")
+        content_type = headers.get("content-type", "")
+        if (
+            len(body) < self.minimum_size
+            or "content-encoding" in headers
+            or not content_type.startswith(COMPRESSIBLE_TYPES)
+        ):
+            await send(buffered.start)
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        if encoding == "br":
+            compressed = brotli.compress(body, quality=BROTLI_QUALITY)
+        else:
+            compressed = gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+        headers["content-encoding"] = encoding
+        headers["content-length"] = str(len(compressed))
+        etag = headers.get("etag")
+        if etag and etag.endswith('"'):
+            headers["etag"] = f'{etag[:-1]}-{encoding}"'
+
+        await send(buffered.start)
+        await send({"type": "http.response.body", "body": compressed})
+
+    @staticmethod
+    def _as_sent_by_client(etag: str, client_tags: List[str]) -> str:
+        """Maps a bare ETag back to the encoding-suffixed form the client holds, if any."""
+        if etag.endswith('"'):
+            for suffix in ("-br", "-gzip"):
+                suffixed = f'{etag[:-1]}{suffix}"'
+                if suffixed in client_tags:
+                    return suffixed
+        return etag
+
+    @staticmethod
+    def _strip_etag_suffixes(scope: Scope, headers: Headers) -> Scope:
+        if_none_match = headers.get("if-none-match")
+        if not if_none_match:
+            return scope
+        tags: List[str] = []
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            for suffix in ('-br"', '-gzip"'):
+                if tag.endswith(suffix):
+                    tag = tag[: -len(suffix)] + '"'
+            tags.append(tag)
+        raw = [(k, v) for k, v in scope["headers"] if k != b"if-none-match"]
+        raw.append((b"if-none-match", ", ".join(tags).encode()))
+        return {**scope, "headers": raw}
@@ -1,16 +1,20 @@
+from typing import TYPE_CHECKING
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from supabase import Client
 
 from ..models.models import User
 from .dependencies import get_supabase_client
 
+if TYPE_CHECKING:
+    from supabase import AsyncClient
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")  # Adjust tokenUrl as needed
 
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    supabase: Client = Depends(get_supabase_client),
+    supabase: "AsyncClient" = Depends(get_supabase_client),
 ) -> User:
     """
     Validates Supabase JWT and returns the current user.
@@ -22,14 +26,14 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        user_response = supabase.auth.get_user(token)
+        user_response = await supabase.auth.get_user(token)
         user_data = user_response.user
         if not user_data:
             raise credentials_exception
 
         # Fetch user profile from your 'profiles' table to get `is_premium`
         profile_res = (
-            supabase.table("profiles").select("*").eq("id", user_data.id).single().execute()
+            await supabase.table("profiles").select("is_premium").eq("id", user_data.id).single().execute()
         )
         if not profile_res.data:
             # This might happen if profile is not created on sign-up
@@ -1,7 +1,7 @@
-from typing import List
+from typing import Dict, List, Literal
 from uuid import UUID
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class User(BaseModel):
@@ -14,6 +14,18 @@ class TopicRequest(BaseModel):
     topic: str
 
 
+class ActivityViewRequest(BaseModel):
+    topic: str
+    # The study modes the frontend prefetches
+    activity_type: Literal["quiz", "explanation"]
+
+
+class QuizResultRequest(BaseModel):
+    topic: str
+    score: int
+    total_questions: int
+
+
 class QuizQuestion(BaseModel):
     question_text: str
     options: List[str]
@@ -43,3 +55,46 @@ class ExplanationResponse(BaseModel):
 class DiscussionResponse(BaseModel):
     topic: str
     discussion_points: List[str]
+
+
+class ChatMessage(BaseModel):
+    message: str
+    # The frontend might send history, let's make it optional
+    history: List[Dict[str, str]] = []
+
+
+class ChatResponse(BaseModel):
+    response: str
+
+
+class DueCard(BaseModel):
+    id: int
+    deck_id: int
+    question: str
+    answer: str
+    due_at: str
+
+
+class DueCardsResponse(BaseModel):
+    cards: List[DueCard]
+
+
+class CardReview(BaseModel):
+    card_id: int
+    # SM-2 recall quality: 0 = blackout ... 5 = perfect recall
+    grade: int = Field(ge=0, le=5)
+
+
+class ReviewBatchRequest(BaseModel):
+    reviews: List[CardReview] = Field(min_length=1, max_length=100)
+
+
+class ReviewBatchResponse(BaseModel):
+    reviewed: int
+
+
+class DeckResponse(BaseModel):
+    deck_id: int
+    topic: str
+    added: int
+    total: int
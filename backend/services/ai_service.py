@@ -1,68 +1,86 @@
 import json
-from typing import Any, Dict, List, Literal
+import re
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Literal, Optional, Type
 
 from fastapi import HTTPException, status
-from groq import APIStatusError, AsyncGroq
+from pydantic import BaseModel, ValidationError
 
-from ..config import settings
+if TYPE_CHECKING:
+    from groq import AsyncGroq
 
-# Initialize Groq client, assuming GROQ_API_KEY is in your settings
-groq_client = AsyncGroq(api_key=settings.GROQ_API_KEY) if settings.GROQ_API_KEY else None
+DEFAULT_MODEL = "llama-3.3-70b-versatile"
 
+JSON_SYSTEM_PROMPT = (
+    "You are a helpful assistant that always responds in valid JSON format as requested. "
+    "Do not include any text, explanations, or markdown formatting before or after the JSON object."
+)
 
-async def _get_ai_response(
-    prompt: str,
-    response_format: Literal["text", "json_object"] = "text",
-    model: str = "llama-3-13b-versatile",
-) -> Any:
-    """Generic function to get a response from the AI."""
-    if not groq_client:
+# Upper bound on existing deck questions sent back to the AI when extending a deck
+MAX_EXCLUDED_QUESTIONS = 50
+
+
+def _require_client(client: Optional["AsyncGroq"]) -> "AsyncGroq":
+    if not client:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="AI service not configured. Check GROQ_API_KEY.",
         )
+    return client
+
+
+def _ai_service_error(e: Exception) -> HTTPException:
+    """Maps an exception from the Groq SDK to the HTTPException sent to the client."""
+    from groq import APIStatusError
 
-    system_prompt = "You are a helpful assistant."
+    if isinstance(e, APIStatusError):
+        # Forward the status code and a user-friendly message from the AI service
+        status_code = e.status_code or 503
+        detail = "The AI service is currently unavailable or experiencing issues. Please try again later."
+        if status_code == 429:
+            detail = "You have exceeded the rate limit for the AI service. Please try again later."
+        return HTTPException(status_code=status_code, detail=detail)
+    # Catch any other unexpected errors during communication
+    return HTTPException(
+        status_code=500,
+        detail=f"An unexpected error occurred while communicating with the AI service: {e}",
+    )
+
+
+async def _get_ai_response(
+    client: Optional["AsyncGroq"],
+    prompt: str,
+    response_format: Literal["text", "json_object"] = "text",
+    model: str = DEFAULT_MODEL,
+    messages: Optional[List[Dict[str, str]]] = None,
+) -> Any:
+    """Generic function to get a response from the AI."""
+    client = _require_client(client)
 
     # Prepare creation parameters to avoid passing `None` for response_format
     create_params: Dict[str, Any] = {
-        "messages": [
-            {"role": "system", "content": system_prompt},
+        "messages": messages or [
+            {"role": "system", "content": "You are a helpful assistant."},
             {"role": "user", "content": prompt},
         ],
         "model": model,
     }
 
     if response_format == "json_object":
-        create_params["messages"][0]["content"] = (
-            "You are a helpful assistant that always responds in valid JSON format as requested. "
-            "Do not include any text, explanations, or markdown formatting before or after the JSON object."
-        )
+        create_params["messages"][0]["content"] = JSON_SYSTEM_PROMPT
         create_params["response_format"] = {"type": "json_object"}
 
     try:
-        chat_completion = await groq_client.chat.completions.create(**create_params)
+        chat_completion = await client.chat.completions.create(**create_params)
         response_content = chat_completion.choices[0].message.content or ""
 
         if response_format == "json_object":
             return json.loads(response_content)
         return response_content
 
-    except APIStatusError as e:
-        # Forward the status code and a user-friendly message from the AI service
-        status_code = e.status_code or 503
-        detail = "The AI service is currently unavailable or experiencing issues. Please try again later."
-        if status_code == 429:
-            detail = "You have exceeded the rate limit for the AI service. Please try again later."
-        raise HTTPException(status_code=status_code, detail=detail)
     except json.JSONDecodeError:
         raise HTTPException(status_code=500, detail="AI returned invalid JSON.")
     except Exception as e:
-        # Catch any other unexpected errors during communication
-        raise HTTPException(
-            status_code=500,
-            detail=f"An unexpected error occurred while communicating with the AI service: {e}",
-        )
+        raise _ai_service_error(e)
 
 
 def _extract_json_from_response(data: Dict[str, Any], root_key: str) -> Any:
@@ -78,24 +96,188 @@ def _extract_json_from_response(data: Dict[str, Any], root_key: str) -> Any:
     )
 
 
-async def generate_quiz_from_topic(topic: str) -> dict:
-    """Generates a quiz with multiple-choice questions for a given topic."""
-    prompt = f"""Generate a quiz with 5 multiple-choice questions for the topic '{topic}'.
+# --- Streaming ---
+
+class JSONArrayItemParser:
+    """
+    Incrementally parses a streamed JSON document and yields each object of the
+    array stored under `root_key` as soon as its closing brace arrives.
+    A bare top-level array is accepted too, mirroring _extract_json_from_response,
+    and any text before the JSON (e.g. a markdown code fence) is skipped.
+    """
+
+    def __init__(self, root_key: str):
+        self._array_start = re.compile(r'"' + re.escape(root_key) + r'"\s*:\s*\[')
+        self._buffer = ""
+        self._pos = 0  # Next unscanned character in the buffer
+        self._in_array = False
+        self._done = False
+        self._depth = 0
+        self._item_start = -1
+        self._in_string = False
+        self._escaped = False
+
+    @property
+    def done(self) -> bool:
+        """True once the closing bracket of the array has been seen."""
+        return self._done
+
+    def feed(self, chunk: str) -> Iterator[Dict[str, Any]]:
+        if self._done or not chunk:
+            return
+        self._buffer += chunk
+
+        if not self._in_array:
+            # Whichever comes first decides the shape: '[' is a bare array,
+            # '{' means the array has to be found under root_key.
+            first_bracket = self._buffer.find("[")
+            first_brace = self._buffer.find("{")
+            if first_bracket >= 0 and (first_brace < 0 or first_bracket < first_brace):
+                self._pos = first_bracket + 1
+            else:
+                match = self._array_start.search(self._buffer)
+                if not match:
+                    return
+                self._pos = match.end()
+            self._in_array = True
+
+        buffer = self._buffer
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._item_start = i
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    yield json.loads(buffer[self._item_start:i + 1])
+                    self._item_start = -1
+            elif char == "]" and self._depth == 0:
+                self._done = True
+                break
+
+        # Drop everything already emitted so the buffer stays small.
+        keep_from = self._item_start if self._item_start >= 0 else len(buffer)
+        self._buffer = buffer[keep_from:]
+        if self._item_start >= 0:
+            self._item_start = 0
+        self._pos = len(self._buffer)
+
+
+async def open_ai_json_stream(client: Optional["AsyncGroq"], prompt: str, model: str = DEFAULT_MODEL):
+    """Starts a streamed completion so connection errors surface before the response begins."""
+    client = _require_client(client)
+    try:
+        # JSON mode cannot be combined with streaming, so the JSON shape is enforced
+        # by the system prompt and the incremental parser tolerates stray text.
+        return await client.chat.completions.create(
+            messages=[
+                {"role": "system", "content": JSON_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+            model=model,
+            stream=True,
+        )
+    except Exception as e:
+        raise _ai_service_error(e)
+
+
+async def stream_ai_json_items(
+    stream,
+    root_key: str,
+    item_model: Type[BaseModel],
+    on_item: Optional[Callable[[BaseModel], Awaitable[Optional[BaseModel]]]] = None,
+) -> AsyncIterator[str]:
+    """
+    Consumes a streamed completion and yields one NDJSON line per validated item.
+    `on_item`, if given, is awaited with each validated item before it is sent and
+    returns what to send instead, or None to drop the item (e.g. a duplicate).
+    Errors after the response has started are reported as a final {"error": ...} line.
+    """
+    parser = JSONArrayItemParser(root_key)
+    received = 0
+    try:
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            for item in parser.feed(delta or ""):
+                try:
+                    validated = item_model(**item)
+                except (TypeError, ValidationError):
+                    continue
+                received += 1
+                if on_item is not None:
+                    try:
+                        validated = await on_item(validated)
+                    except Exception as e:
+                        yield json.dumps({"error": f"Could not save a generated item: {e}"}) + "\n"
+                        return
+                    if validated is None:
+                        continue
+                yield validated.model_dump_json() + "\n"
+            if parser.done:
+                # Anything after the closing ']' is not needed.
+                break
+    except json.JSONDecodeError:
+        yield json.dumps({"error": "AI returned invalid JSON."}) + "\n"
+        return
+    except Exception as e:
+        yield json.dumps({"error": _ai_service_error(e).detail}) + "\n"
+        return
+    finally:
+        # Also runs when the client disconnects and the response generator is closed,
+        # so the upstream HTTP stream is released right away rather than on garbage collection.
+        await stream.close()
+
+    if received == 0:
+        yield json.dumps({"error": f"AI response did not contain the expected root key '{root_key}'."}) + "\n"
+
+
+# --- Prompts ---
+
+def quiz_prompt(topic: str) -> str:
+    return f"""Generate a quiz with 5 multiple-choice questions for the topic '{topic}'.
 You must respond with a single valid JSON object with a key "questions".
 The value for "questions" must be a JSON array of 5 objects.
 Each object must have keys: "question_text" (string), "options" (array of 4 strings), and "correct_answer" (string matching an option)."""
-    json_response = await _get_ai_response(prompt, response_format="json_object")
-    questions = _extract_json_from_response(json_response, "questions")
-    return {"questions": questions}
 
 
-async def generate_flashcards_from_topic(topic: str) -> dict:
-    """Generates flashcards for a given topic."""
+def flashcards_prompt(topic: str, exclude: Optional[List[str]] = None) -> str:
+    """`exclude` lists questions already in the user's deck so the AI only adds new material."""
     prompt = f"""Generate 5 flashcards for the topic '{topic}'.
 You must respond with a single valid JSON object with a key "flashcards".
 The value for "flashcards" must be a JSON array of 5 objects.
 Each object must have exactly two string keys: "question" and "answer"."""
-    json_response = await _get_ai_response(prompt, response_format="json_object")
+    if exclude:
+        # Keep the prompt bounded for large decks; the most recent questions matter most.
+        existing = "\n".join(f"- {question}" for question in exclude[-MAX_EXCLUDED_QUESTIONS:])
+        prompt += f"\nDo not repeat any of these questions the student already has:\n{existing}"
+    return prompt
+
+
+# --- Generators ---
+
+async def generate_quiz_from_topic(client: Optional["AsyncGroq"], topic: str) -> dict:
+    """Generates a quiz with multiple-choice questions for a given topic."""
+    json_response = await _get_ai_response(client, quiz_prompt(topic), response_format="json_object")
+    questions = _extract_json_from_response(json_response, "questions")
+    return {"questions": questions}
+
+
+async def generate_flashcards_from_topic(
+    client: Optional["AsyncGroq"], topic: str, exclude: Optional[List[str]] = None
+) -> dict:
+    """Generates flashcards for a given topic."""
+    json_response = await _get_ai_response(client, flashcards_prompt(topic, exclude), response_format="json_object")
     flashcards = _extract_json_from_response(json_response, "flashcards")
     if not flashcards:
         raise HTTPException(
@@ -105,14 +287,14 @@ Each object must have exactly two string keys: "question" and "answer"."""
     return {"flashcards": flashcards}
 
 
-async def generate_explanation_from_topic(topic: str) -> str:
+async def generate_explanation_from_topic(client: Optional["AsyncGroq"], topic: str) -> str:
     """Generates a detailed explanation for a given topic."""
     prompt = f"Provide a detailed, easy-to-understand explanation of the topic: '{topic}'. Structure it with a clear introduction, main body with key points, and a conclusion. Use paragraphs for readability."
-    explanation = await _get_ai_response(prompt, response_format="text")
+    explanation = await _get_ai_response(client, prompt, response_format="text")
     return explanation
 
 
-async def generate_discussion_from_topic(topic: str) -> dict:
+async def generate_discussion_from_topic(client: Optional["AsyncGroq"], topic: str) -> dict:
     """Generates discussion points for a given topic."""
     prompt = f"""Generate 5 thought-provoking discussion points or open-ended questions for the topic '{topic}'.
 You must respond with a single valid JSON object with a key "discussion_points".
@@ -125,6 +307,26 @@ Example format:
     "Point 2..."
   ]
 }}"""
-    json_response = await _get_ai_response(prompt, response_format="json_object")
+    json_response = await _get_ai_response(client, prompt, response_format="json_object")
     points = _extract_json_from_response(json_response, "discussion_points")
-    return {"discussion_points": points}
\ No newline at end of file
+    return {"discussion_points": points}
+
+
+async def start_discussion_on_topic(client: Optional["AsyncGroq"], topic: str) -> str:
+    """Opens a discussion on a topic with an engaging question."""
+    prompt = f"You are an educational AI assistant. Start a friendly discussion about the topic: {topic}. Ask an engaging opening question to get the user talking."
+    return await _get_ai_response(client, prompt, response_format="text")
+
+
+async def continue_discussion(client: Optional["AsyncGroq"], message: str, history: List[Dict[str, str]]) -> str:
+    """Continues a discussion given the client-side chat history and the user's latest message."""
+    # Send the full message history to the AI, which is more effective than a flat string.
+    messages = [
+        {"role": "system", "content": "You are a helpful educational assistant continuing a discussion. Provide a concise and engaging response to continue the conversation based on the user's last message."}
+    ]
+    for msg in history:
+        # Ensure the history has the correct format before appending
+        if "role" in msg and "content" in msg:
+            messages.append({"role": msg["role"], "content": msg["content"]})
+    messages.append({"role": "user", "content": message})
+    return await _get_ai_response(client, message, response_format="text", messages=messages)
@@ -0,0 +1,264 @@
+import asyncio
+import logging
+from datetime import date, datetime, timezone
+from typing import Dict, List, Literal, Optional, Set, Tuple
+
+from pydantic import BaseModel, Field
+
+from ..core.clients import Clients
+
+logger = logging.getLogger("uvicorn")
+
+ActivityType = Literal["quiz", "flashcard", "explanation", "discussion"]
+ALL_ACTIVITY_TYPES = ("quiz", "flashcard", "explanation", "discussion")
+
+# Events are buffered for at most this long (or until the batch is full)
+# before counters and milestones are written back in one round trip each.
+FLUSH_INTERVAL_SECONDS = 1.0
+MAX_BATCH_SIZE = 200
+MAX_QUEUE_SIZE = 10_000
+# Rounds of reload-and-retry for users whose counters another worker saved first
+MAX_SAVE_ATTEMPTS = 3
+# How long shutdown waits for queued events to be written
+SHUTDOWN_FLUSH_TIMEOUT_SECONDS = 5.0
+
+
+# --- Models ---
+
+class ActivityEvent(BaseModel):
+    """Something a user did. Quiz results carry a score; generations do not."""
+    user_id: str
+    activity_type: ActivityType
+    topic: str
+    completed_quiz: bool = False
+    score: Optional[int] = None
+    total_questions: Optional[int] = None
+    occurred_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class UserCounters(BaseModel):
+    """Running per-user aggregates that every rule is evaluated against."""
+    activity_counts: Dict[str, int] = Field(default_factory=dict)
+    quizzes_completed: int = 0
+    quizzes_by_topic: Dict[str, int] = Field(default_factory=dict)
+    last_active_on: Optional[date] = None
+    current_streak: int = 0
+    awarded: List[str] = Field(default_factory=list)
+
+
+class MilestoneRule(BaseModel):
+    """
+    A declarative milestone definition.
+
+    kind:
+      - "activity_count": at least `threshold` events of `activity_type`
+      - "quizzes_completed": at least `threshold` completed quizzes
+      - "topic_quizzes": at least `threshold` completed quizzes on one topic
+      - "score_percent": a single quiz scored at least `threshold` percent
+      - "streak_days": active on `threshold` consecutive days
+      - "all_activities": at least `threshold` events of every activity type
+    """
+    name: str
+    description: str  # May reference {topic}
+    kind: Literal[
+        "activity_count",
+        "quizzes_completed",
+        "topic_quizzes",
+        "score_percent",
+        "streak_days",
+        "all_activities",
+    ]
+    threshold: int
+    activity_type: Optional[ActivityType] = None
+
+
+MILESTONE_RULES: List[MilestoneRule] = [
+    MilestoneRule(name="First Perfect Score", description="Achieved a perfect score on the '{topic}' quiz!", kind="score_percent", threshold=100),
+    MilestoneRule(name="High Achiever", description="Scored 80% or more on the '{topic}' quiz.", kind="score_percent", threshold=80),
+    MilestoneRule(name="First Quiz", description="Completed your first quiz.", kind="quizzes_completed", threshold=1),
+    MilestoneRule(name="Quiz Enthusiast", description="Completed 10 quizzes.", kind="quizzes_completed", threshold=10),
+    MilestoneRule(name="Quiz Master", description="Completed 50 quizzes.", kind="quizzes_completed", threshold=50),
+    MilestoneRule(name="Topic Specialist", description="Completed 5 quizzes on '{topic}'.", kind="topic_quizzes", threshold=5),
+    MilestoneRule(name="Flashcard Fan", description="Studied 10 sets of flashcards.", kind="activity_count", activity_type="flashcard", threshold=10),
+    MilestoneRule(name="Curious Mind", description="Read 10 explanations.", kind="activity_count", activity_type="explanation", threshold=10),
+    MilestoneRule(name="Conversationalist", description="Started 10 discussions.", kind="activity_count", activity_type="discussion", threshold=10),
+    MilestoneRule(name="Well Rounded", description="Tried quizzes, flashcards, explanations and discussions.", kind="all_activities", threshold=1),
+    MilestoneRule(name="3-Day Streak", description="Studied 3 days in a row.", kind="streak_days", threshold=3),
+    MilestoneRule(name="7-Day Streak", description="Studied 7 days in a row.", kind="streak_days", threshold=7),
+]
+
+
+# --- Evaluation ---
+
+def apply_event(counters: UserCounters, event: ActivityEvent) -> None:
+    """Folds a single event into the user's counters."""
+    counters.activity_counts[event.activity_type] = counters.activity_counts.get(event.activity_type, 0) + 1
+    if event.completed_quiz:
+        counters.quizzes_completed += 1
+        counters.quizzes_by_topic[event.topic] = counters.quizzes_by_topic.get(event.topic, 0) + 1
+
+    today = event.occurred_at.astimezone(timezone.utc).date()
+    if counters.last_active_on is None or (today - counters.last_active_on).days > 1:
+        counters.current_streak = 1
+    elif (today - counters.last_active_on).days == 1:
+        counters.current_streak += 1
+    # Several events on the same day (or out-of-order older ones) leave the streak alone.
+    if counters.last_active_on is None or today > counters.last_active_on:
+        counters.last_active_on = today
+
+
+def _rule_is_met(rule: MilestoneRule, counters: UserCounters, event: ActivityEvent) -> bool:
+    if rule.kind == "activity_count":
+        return counters.activity_counts.get(rule.activity_type, 0) >= rule.threshold
+    if rule.kind == "quizzes_completed":
+        return counters.quizzes_completed >= rule.threshold
+    if rule.kind == "topic_quizzes":
+        return counters.quizzes_by_topic.get(event.topic, 0) >= rule.threshold
+    if rule.kind == "score_percent":
+        if not event.completed_quiz or event.score is None or not event.total_questions:
+            return False
+        return event.score * 100 >= rule.threshold * event.total_questions
+    if rule.kind == "streak_days":
+        return counters.current_streak >= rule.threshold
+    if rule.kind == "all_activities":
+        return all(counters.activity_counts.get(a, 0) >= rule.threshold for a in ALL_ACTIVITY_TYPES)
+    return False
+
+
+def _rule_is_affected(rule: MilestoneRule, event: ActivityEvent) -> bool:
+    """Skips rules whose inputs this event cannot have changed."""
+    if rule.kind in ("quizzes_completed", "topic_quizzes", "score_percent"):
+        return event.completed_quiz
+    if rule.kind == "activity_count":
+        return rule.activity_type == event.activity_type
+    return True
+
+
+def evaluate_event(counters: UserCounters, event: ActivityEvent, rules: List[MilestoneRule] = MILESTONE_RULES) -> List[dict]:
+    """
+    Applies the event and returns milestone rows for every rule it newly satisfies.
+    Already-awarded milestones are never re-checked.
+    """
+    apply_event(counters, event)
+    awarded = []
+    for rule in rules:
+        if rule.name in counters.awarded or not _rule_is_affected(rule, event):
+            continue
+        if _rule_is_met(rule, counters, event):
+            counters.awarded.append(rule.name)
+            awarded.append({
+                "user_id": event.user_id,
+                "milestone_name": rule.name,
+                "milestone_description": rule.description.format(topic=event.topic),
+            })
+    return awarded
+
+
+# --- Engine ---
+
+class MilestoneEngine:
+    """
+    Evaluates milestone rules off the request path.
+
+    Endpoints call `publish`, which only enqueues the event. A background worker
+    drains the queue in batches. Each batch reads the affected users' counters from
+    the `user_counters` table, writes new milestones with one upsert, and saves the
+    counters with `save_user_counters`. That save is versioned, so when several
+    workers or instances update the same user, the loser reloads and retries instead
+    of overwriting the other's counts.
+    """
+
+    def __init__(self, rules: List[MilestoneRule] = MILESTONE_RULES):
+        self.rules = rules
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._clients: Optional[Clients] = None
+
+    def start(self, clients: Clients) -> None:
+        """Starts the background worker. Called from the application lifespan."""
+        self._clients = clients
+        self._queue = asyncio.Queue(maxsize=MAX_QUEUE_SIZE)
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Writes out queued events (bounded by a timeout) and stops the worker."""
+        if self._worker is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), SHUTDOWN_FLUSH_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropping {self._queue.qsize()} unprocessed milestone events on shutdown")
+        self._worker.cancel()
+        self._worker = None
+
+    def publish(self, event: ActivityEvent) -> None:
+        """Queues an event without waiting on the database. Drops it if the queue is full."""
+        if self._worker is None:
+            logger.warning(f"Milestone engine not started; dropping event for user {event.user_id}")
+            return
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.warning(f"Milestone queue is full; dropping event for user {event.user_id}")
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + FLUSH_INTERVAL_SECONDS
+            while len(batch) < MAX_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                supabase = await self._clients.get_supabase()
+                await self._process_batch(supabase, batch)
+            except Exception as e:
+                logger.error(f"Error processing milestone batch of {len(batch)} events: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _load_counters(self, supabase, user_ids: List[str]) -> Dict[str, Tuple[UserCounters, int]]:
+        """Reads counters and their versions; users without a row get fresh counters at version 0."""
+        response = await supabase.table("user_counters").select("user_id, counters, version").in_("user_id", user_ids).execute()
+        loaded = {user_id: (UserCounters(), 0) for user_id in user_ids}
+        for row in response.data or []:
+            loaded[row["user_id"]] = (UserCounters(**(row["counters"] or {})), row["version"])
+        return loaded
+
+    async def _apply_events(self, supabase, events: List[ActivityEvent]) -> Set[str]:
+        """Applies events on top of the stored counters. Returns the users whose save lost a race."""
+        user_ids = list(dict.fromkeys(event.user_id for event in events))
+        loaded = await self._load_counters(supabase, user_ids)
+
+        new_milestones = []
+        for event in events:
+            new_milestones.extend(evaluate_event(loaded[event.user_id][0], event, self.rules))
+
+        # Milestones are written before the counters that record them as awarded, so a
+        # failure here can't leave an award in `awarded` without its milestone row.
+        # Rules only ever become true as counts grow, so rows written before a lost
+        # counter save are still correct, and the retry's duplicates are ignored.
+        if new_milestones:
+            await supabase.table("milestones").upsert(
+                new_milestones, on_conflict="user_id,milestone_name", ignore_duplicates=True
+            ).execute()
+        response = await supabase.rpc("save_user_counters", {"p_rows": [
+            {"user_id": user_id, "counters": counters.model_dump(mode="json"), "version": version}
+            for user_id, (counters, version) in loaded.items()
+        ]}).execute()
+        return set(response.data or [])
+
+    async def _process_batch(self, supabase, batch: List[ActivityEvent]) -> None:
+        pending = batch
+        for _ in range(MAX_SAVE_ATTEMPTS):
+            conflicted = await self._apply_events(supabase, pending)
+            if not conflicted:
+                return
+            pending = [event for event in pending if event.user_id in conflicted]
+        logger.warning(f"Dropping {len(pending)} milestone events after repeated counter update conflicts")
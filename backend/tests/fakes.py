@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+
+
+class FakeQuery:
+    """Records every builder call (select, eq, order, ...) and answers execute() from the fake client."""
+
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.calls = []
+
+    def __getattr__(self, method):
+        def record(*args, **kwargs):
+            self.calls.append((method, args, kwargs))
+            return self
+        return record
+
+    def called(self, method):
+        return [args for name, args, _ in self.calls if name == method]
+
+    async def execute(self):
+        responses = self.client.responses.get(self.name, [])
+        data = responses.pop(0) if responses else []
+        return SimpleNamespace(data=data(self) if callable(data) else data)
+
+
+class FakeSupabase:
+    """
+    Stands in for the async Supabase client. `responses` maps a table name (or
+    "rpc:<function>") to the results of its queries, in order; a result may be a
+    callable that receives the query.
+    """
+
+    def __init__(self, responses=None):
+        self.responses = {name: list(results) for name, results in (responses or {}).items()}
+        self.queries = []
+
+    def table(self, name):
+        query = FakeQuery(self, name)
+        self.queries.append(query)
+        return query
+
+    def rpc(self, function, params):
+        query = FakeQuery(self, f"rpc:{function}")
+        query.params = params
+        self.queries.append(query)
+        return query
+
+    def queries_for(self, name):
+        return [query for query in self.queries if query.name == name]
+
+
+class FakeStream:
+    """Stands in for the SDK's async stream of completion chunks."""
+
+    def __init__(self, pieces):
+        self._pieces = pieces
+        self.read = 0
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.read == len(self._pieces):
+            raise StopAsyncIteration
+        piece = self._pieces[self.read]
+        self.read += 1
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+    async def close(self):
+        self.closed = True
@@ -0,0 +1,68 @@
+import asyncio
+import json
+
+from backend.models.models import Flashcard
+from backend.services.ai_service import JSONArrayItemParser, stream_ai_json_items
+from backend.tests.fakes import FakeStream
+
+
+def feed_one_char_at_a_time(document: str, root_key: str = "flashcards"):
+    parser = JSONArrayItemParser(root_key)
+    items = []
+    for char in document:
+        items.extend(parser.feed(char))
+    return items, parser
+
+
+def test_object_with_root_key():
+    items, parser = feed_one_char_at_a_time(
+        '{"flashcards": [{"question": "a", "answer": "b"}, {"question": "c", "answer": "d"}]}'
+    )
+    assert items == [{"question": "a", "answer": "b"}, {"question": "c", "answer": "d"}]
+    assert parser.done
+
+
+def test_braces_brackets_and_quotes_inside_strings():
+    cards = [
+        {"question": "What does {x} mean?", "answer": "a set ] of \"things\" }"},
+        {"question": "Escaped backslash \\", "answer": "[ok]"},
+    ]
+    items, _ = feed_one_char_at_a_time(json.dumps({"flashcards": cards}))
+    assert items == cards
+
+
+def test_markdown_prefix_and_trailing_text():
+    items, parser = feed_one_char_at_a_time(
+        'Sure!\n```json\n{"flashcards": [{"question": "a", "answer": "b"}]}\n```\nHope this helps {'
+    )
+    assert items == [{"question": "a", "answer": "b"}]
+    assert parser.done
+
+
+def test_bare_array():
+    items, parser = feed_one_char_at_a_time('```json\n[{"question": "a", "answer": "b"}]\n```')
+    assert items == [{"question": "a", "answer": "b"}]
+    assert parser.done
+
+
+def test_other_keys_before_root_key():
+    items, _ = feed_one_char_at_a_time(
+        '{"topic": "x", "notes": {"k": "v"}, "flashcards": [{"question": "a", "answer": "b"}]}'
+    )
+    assert items == [{"question": "a", "answer": "b"}]
+
+
+def test_stream_skips_invalid_items_stops_at_end_and_closes():
+    stream = FakeStream([
+        '{"flashcards": [{"question": "a", "answer": "b"},',
+        ' {"front": "no"}]}',
+        " trailing text that is never read",
+    ])
+
+    async def collect():
+        return [line async for line in stream_ai_json_items(stream, "flashcards", Flashcard)]
+
+    lines = asyncio.run(collect())
+    assert [json.loads(line) for line in lines] == [{"question": "a", "answer": "b"}]
+    assert stream.read == 2
+    assert stream.closed
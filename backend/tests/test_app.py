@@ -0,0 +1,50 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from backend.core.config import Settings
+from backend.main import create_app
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+def test_creating_the_app_imports_neither_sdk():
+    # A fresh interpreter, since this test run has long since imported both SDKs.
+    script = (
+        "import sys\n"
+        "from backend.main import create_app\n"
+        "create_app()\n"
+        "print(','.join(m for m in ('supabase', 'groq') if m in sys.modules))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    )
+    assert result.stdout.strip() == ""
+
+
+def test_lifespan_warms_up_and_closes_the_clients():
+    settings = Settings(SUPABASE_URL="http://localhost:1", SUPABASE_SERVICE_KEY="service-key", GROQ_API_KEY="groq-key")
+    app = create_app(settings)
+
+    async def finish_warm_up():
+        await app.state.warm_up
+
+    with TestClient(app) as client:
+        assert client.get("/").status_code == 200
+        client.portal.call(finish_warm_up)
+        clients = app.state.clients
+        assert clients._supabase is not None and clients._groq is not None
+
+    assert app.state.warm_up.done()
+    assert clients._groq._client.is_closed
+    assert clients._supabase.postgrest.session.is_closed
+    assert clients._supabase.auth._http_client.is_closed
+
+
+def test_lifespan_stops_cleanly_during_warm_up():
+    app = create_app(Settings(SUPABASE_URL=None, SUPABASE_SERVICE_KEY=None, GROQ_API_KEY=None))
+    with TestClient(app):
+        pass
+    assert app.state.warm_up.done()
@@ -0,0 +1,68 @@
+import asyncio
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from backend.api.content import _check_and_log_usage, log_prefetched_view
+from backend.core.dependencies import is_prefetch_request
+from backend.models.models import ActivityViewRequest, User
+from backend.tests.fakes import FakeSupabase
+
+USER_ID = uuid.UUID("00000000-0000-0000-0000-000000000001")
+PREMIUM_USER = User(id=USER_ID, email="user@example.com", is_premium=True)
+FREE_USER = User(id=USER_ID, email="user@example.com")
+
+
+class RecordingMilestones:
+    def __init__(self):
+        self.events = []
+
+    def publish(self, event):
+        self.events.append(event)
+
+
+def request_with_headers(headers):
+    raw = [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "POST", "path": "/", "headers": raw})
+
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"Purpose": "prefetch"}, True),
+    ({"Sec-Purpose": "prefetch;prerender"}, True),
+    ({"Purpose": "navigate"}, False),
+    ({}, False),
+])
+def test_prefetch_header(headers, expected):
+    assert is_prefetch_request(request_with_headers(headers)) is expected
+
+
+def test_premium_prefetch_logs_no_activity():
+    supabase = FakeSupabase()
+    milestones = RecordingMilestones()
+
+    asyncio.run(_check_and_log_usage(supabase, PREMIUM_USER, "math", "explanation", milestones, prefetch=True))
+
+    assert supabase.queries == []
+    assert milestones.events == []
+
+
+def test_free_users_cannot_prefetch():
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(_check_and_log_usage(FakeSupabase(), FREE_USER, "math", "explanation", RecordingMilestones(), prefetch=True))
+    assert error.value.status_code == 403
+
+
+def test_viewing_prefetched_content_logs_the_activity():
+    supabase = FakeSupabase({"rpc:can_and_log_activity": [True]})
+    milestones = RecordingMilestones()
+
+    asyncio.run(log_prefetched_view(
+        request=ActivityViewRequest(topic="math", activity_type="explanation"),
+        current_user=PREMIUM_USER, supabase=supabase, milestones=milestones,
+    ))
+
+    params = supabase.queries_for("rpc:can_and_log_activity")[0].params
+    assert (params["p_activity_type"], params["p_topic"]) == ("explanation", "math")
+    assert [(event.activity_type, event.topic) for event in milestones.events] == [("explanation", "math")]
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import uuid
+
+from backend.api import flashcards
+from backend.models.models import CardReview, ReviewBatchRequest, TopicRequest, User
+from backend.tests.fakes import FakeStream, FakeSupabase
+
+USER = User(id=uuid.UUID("00000000-0000-0000-0000-000000000001"), email="user@example.com")
+
+
+class RecordingMilestones:
+    def __init__(self):
+        self.events = []
+
+    def publish(self, event):
+        self.events.append(event)
+
+
+def extension_responses(existing_questions):
+    return {
+        "rpc:can_and_log_activity": [True],
+        "flashcard_decks": [[{"id": 9, "user_id": str(USER.id), "topic": "math"}]],
+        "flashcards": [[{"question": question} for question in existing_questions]],
+    }
+
+
+def test_due_cards_for_a_topic_take_one_query():
+    row = {
+        "id": 1, "deck_id": 9, "question": "q", "answer": "a",
+        "due_at": "2025-08-05T00:00:00+00:00", "flashcard_decks": {"topic": "math"},
+    }
+    supabase = FakeSupabase({"flashcards": [[row]]})
+
+    response = asyncio.run(flashcards.get_due_flashcards(
+        limit=20, deck_id=None, topic="math", current_user=USER, supabase=supabase,
+    ))
+
+    assert [card.id for card in response.cards] == [1]
+    assert [query.name for query in supabase.queries] == ["flashcards"]
+    query = supabase.queries[0]
+    assert query.called("select") == [("id, deck_id, question, answer, due_at, flashcard_decks!inner(topic)",)]
+    assert ("flashcard_decks.topic", "math") in query.called("eq")
+
+
+def test_due_cards_without_a_topic_do_not_embed_the_deck():
+    supabase = FakeSupabase({"flashcards": [[]]})
+    asyncio.run(flashcards.get_due_flashcards(
+        limit=20, deck_id=9, topic=None, current_user=USER, supabase=supabase,
+    ))
+    query = supabase.queries[0]
+    assert query.called("select") == [("id, deck_id, question, answer, due_at",)]
+    assert ("deck_id", 9) in query.called("eq")
+
+
+def test_reviews_keep_only_the_latest_grade_per_card():
+    supabase = FakeSupabase({"rpc:review_flashcards": [2]})
+    request = ReviewBatchRequest(reviews=[
+        CardReview(card_id=1, grade=1), CardReview(card_id=2, grade=4), CardReview(card_id=1, grade=5),
+    ])
+
+    response = asyncio.run(flashcards.submit_reviews(request=request, current_user=USER, supabase=supabase))
+
+    assert response.reviewed == 2
+    params = supabase.queries_for("rpc:review_flashcards")[0].params
+    assert params["p_reviews"] == [{"card_id": 1, "grade": 5}, {"card_id": 2, "grade": 4}]
+
+
+def test_extend_deck_skips_duplicate_and_malformed_cards(monkeypatch):
+    async def fake_generate(groq, topic, exclude=None):
+        assert exclude == ["What is 2+2?"]
+        return {"flashcards": [
+            {"question": "  what is 2+2? ", "answer": "4"},
+            {"front": "malformed"},
+            "not even an object",
+            {"question": "What is 3+3?", "answer": "6"},
+            {"question": "WHAT IS 3+3?", "answer": "six"},
+        ]}
+
+    monkeypatch.setattr(flashcards.ai_service, "generate_flashcards_from_topic", fake_generate)
+    supabase = FakeSupabase(extension_responses(["What is 2+2?"]))
+    milestones = RecordingMilestones()
+
+    response = asyncio.run(flashcards.extend_deck(
+        request=TopicRequest(topic="math"), current_user=USER, supabase=supabase, groq=None, milestones=milestones,
+    ))
+
+    assert (response.added, response.total) == (1, 2)
+    insert = supabase.queries_for("flashcards")[1]
+    assert insert.called("insert") == [([
+        {"deck_id": 9, "user_id": str(USER.id), "question": "What is 3+3?", "answer": "6"},
+    ],)]
+    assert [event.activity_type for event in milestones.events] == ["flashcard"]
+
+
+def test_extend_deck_stream_stores_and_sends_each_new_card(monkeypatch):
+    stream = FakeStream([
+        '{"flashcards": [{"question": "What is 2+2?", "answer": "4"},',
+        ' {"front": "malformed"}, {"question": "What is 3+3?", "answer": "6"}',
+        "]}",
+    ])
+
+    async def fake_open(groq, prompt):
+        assert "What is 2+2?" in prompt
+        return stream
+
+    monkeypatch.setattr(flashcards.ai_service, "open_ai_json_stream", fake_open)
+    responses = extension_responses(["What is 2+2?"])
+
+    def inserted(query):
+        row = query.called("insert")[0][0]
+        return [{**row, "id": 100, "due_at": "2025-08-05T00:00:00+00:00"}]
+
+    responses["flashcards"].append(inserted)
+    supabase = FakeSupabase(responses)
+
+    async def collect():
+        response = await flashcards.extend_deck_stream(
+            request=TopicRequest(topic="math"), current_user=USER, supabase=supabase, groq=None,
+            milestones=RecordingMilestones(),
+        )
+        return [json.loads(line) async for line in response.body_iterator]
+
+    lines = asyncio.run(collect())
+
+    assert lines == [{
+        "id": 100, "deck_id": 9, "question": "What is 3+3?", "answer": "6", "due_at": "2025-08-05T00:00:00+00:00",
+    }]
+    assert len(supabase.queries_for("flashcards")) == 2
+    assert stream.closed
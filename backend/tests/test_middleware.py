@@ -0,0 +1,63 @@
+import base64
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.core.middleware import CompressionMiddleware, ETagMiddleware
+
+
+def bearer_for(user_id: str, issued_at: int) -> str:
+    def encode(data: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+    return "Bearer " + ".".join([encode({"alg": "HS256"}), encode({"sub": user_id, "iat": issued_at}), "signature"])
+
+
+def make_client():
+    app = FastAPI()
+    calls = []
+
+    @app.post("/generate")
+    def generate(body: dict):
+        calls.append(body)
+        return {"topic": body["topic"], "text": "x" * 2000}
+
+    app.add_middleware(ETagMiddleware, revalidate_paths=["/generate"])
+    app.add_middleware(CompressionMiddleware)
+    return TestClient(app), calls
+
+
+def test_revalidation_survives_token_refresh_and_echoes_encoded_etag():
+    client, calls = make_client()
+    first = client.post(
+        "/generate", json={"topic": "math"},
+        headers={"Authorization": bearer_for("user-1", 1), "Accept-Encoding": "gzip"},
+    )
+    etag = first.headers["etag"]
+    assert etag.endswith('-gzip"')
+
+    # A refreshed access token for the same user still revalidates.
+    second = client.post(
+        "/generate", json={"topic": "math"},
+        headers={"Authorization": bearer_for("user-1", 2), "Accept-Encoding": "gzip", "If-None-Match": etag},
+    )
+    assert second.status_code == 304
+    assert second.headers["etag"] == etag
+    assert len(calls) == 1
+
+
+def test_revalidation_requires_the_exact_tag_and_the_same_user():
+    client, calls = make_client()
+    etag = client.post("/generate", json={"topic": "math"}, headers={"Authorization": bearer_for("user-1", 1)}).headers["etag"]
+
+    other_user = client.post(
+        "/generate", json={"topic": "math"},
+        headers={"Authorization": bearer_for("user-2", 1), "If-None-Match": etag},
+    )
+    wildcard = client.post(
+        "/generate", json={"topic": "math"},
+        headers={"Authorization": bearer_for("user-1", 1), "If-None-Match": "*"},
+    )
+    assert other_user.status_code == 200
+    assert wildcard.status_code == 200
+    assert len(calls) == 3
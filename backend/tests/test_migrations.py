@@ -0,0 +1,105 @@
+"""
+Runs the SQL migrations against a real Postgres. Set TEST_DATABASE_URL to a scratch
+database to enable these tests; everything runs in one transaction that is rolled back.
+The Supabase-provided pieces the migrations rely on (auth.users, auth.uid(), the API
+roles, and the pre-existing history/milestones tables) are stubbed first.
+"""
+import json
+import os
+import uuid
+from pathlib import Path
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+MIGRATIONS = Path(__file__).resolve().parents[2] / "supabase" / "migrations"
+
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+SUPABASE_STUBS = """
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT FROM pg_roles WHERE rolname = 'anon') THEN CREATE ROLE anon; END IF;
+  IF NOT EXISTS (SELECT FROM pg_roles WHERE rolname = 'authenticated') THEN CREATE ROLE authenticated; END IF;
+  IF NOT EXISTS (SELECT FROM pg_roles WHERE rolname = 'service_role') THEN CREATE ROLE service_role; END IF;
+END
+$$;
+CREATE SCHEMA IF NOT EXISTS auth;
+CREATE TABLE IF NOT EXISTS auth.users (id uuid PRIMARY KEY);
+CREATE OR REPLACE FUNCTION auth.uid() RETURNS uuid LANGUAGE sql AS $$ SELECT NULL::uuid $$;
+CREATE TABLE IF NOT EXISTS public.history (
+  id bigint generated by default as identity PRIMARY KEY,
+  user_id uuid NOT NULL,
+  topic text,
+  activity_type text,
+  score integer,
+  total_questions integer,
+  created_at timestamptz NOT NULL DEFAULT now()
+);
+CREATE TABLE IF NOT EXISTS public.milestones (
+  user_id uuid NOT NULL,
+  milestone_name text NOT NULL,
+  milestone_description text,
+  achieved_at timestamptz NOT NULL DEFAULT now()
+);
+"""
+
+
+@pytest.fixture
+def db():
+    connection = psycopg2.connect(DATABASE_URL)
+    cursor = connection.cursor()
+    cursor.execute(SUPABASE_STUBS)
+    yield cursor
+    connection.rollback()
+    connection.close()
+
+
+def run_migration(cursor, name):
+    cursor.execute((MIGRATIONS / name).read_text())
+
+
+def create_user(cursor):
+    user_id = str(uuid.uuid4())
+    cursor.execute("INSERT INTO auth.users (id) VALUES (%s)", (user_id,))
+    return user_id
+
+
+def test_review_flashcards_survives_long_runs_of_good_reviews(db):
+    run_migration(db, "20250819_add_flashcard_decks.sql")
+    user_id = create_user(db)
+    db.execute("INSERT INTO flashcard_decks (user_id, topic) VALUES (%s, 'math') RETURNING id", (user_id,))
+    deck_id = db.fetchone()[0]
+    db.execute(
+        "INSERT INTO flashcards (deck_id, user_id, question, answer) VALUES (%s, %s, 'q', 'a') RETURNING id",
+        (deck_id, user_id),
+    )
+    card_id = db.fetchone()[0]
+
+    intervals = []
+    for _ in range(12):
+        db.execute("SELECT review_flashcards(%s, %s)", (user_id, json.dumps([{"card_id": card_id, "grade": 4}])))
+        assert db.fetchone()[0] == 1
+        db.execute("SELECT interval_days FROM flashcards WHERE id = %s", (card_id,))
+        intervals.append(db.fetchone()[0])
+
+    # Grade 4 keeps the ease at 2.5; the interval is capped at the smallint maximum.
+    assert intervals[:8] == [1, 6, 15, 38, 95, 238, 595, 1488]
+    assert intervals[-1] == 32767
+
+
+def test_review_flashcards_ignores_other_users_cards(db):
+    run_migration(db, "20250819_add_flashcard_decks.sql")
+    owner, other = create_user(db), create_user(db)
+    db.execute("INSERT INTO flashcard_decks (user_id, topic) VALUES (%s, 'math') RETURNING id", (owner,))
+    deck_id = db.fetchone()[0]
+    db.execute(
+        "INSERT INTO flashcards (deck_id, user_id, question, answer) VALUES (%s, %s, 'q', 'a') RETURNING id",
+        (deck_id, owner),
+    )
+    card_id = db.fetchone()[0]
+
+    db.execute("SELECT review_flashcards(%s, %s)", (other, json.dumps([{"card_id": card_id, "grade": 5}])))
+    assert db.fetchone()[0] == 0
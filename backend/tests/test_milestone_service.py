@@ -0,0 +1,101 @@
+import asyncio
+from types import SimpleNamespace
+
+from backend.services.milestone_service import ActivityEvent, MilestoneEngine, UserCounters
+
+USER_ID = "00000000-0000-0000-0000-000000000001"
+
+
+class FakeQuery:
+    def __init__(self, run):
+        self._run = run
+
+    def select(self, *args):
+        return self
+
+    def in_(self, *args):
+        return self
+
+    async def execute(self):
+        return SimpleNamespace(data=self._run())
+
+
+class FakeSupabase:
+    """Just enough of the client for the engine: counters with versions, milestones, and the save RPC."""
+
+    def __init__(self):
+        self.counters = {}  # user_id -> (counters dict, version)
+        self.milestones = set()
+        self.fail_milestone_writes = 0
+        self.saved_elsewhere_before_next_save = None
+
+    def table(self, name):
+        client = self
+        if name == "user_counters":
+            return FakeQuery(lambda: [
+                {"user_id": user_id, "counters": counters, "version": version}
+                for user_id, (counters, version) in client.counters.items()
+            ])
+
+        class Milestones:
+            def upsert(self, rows, **kwargs):
+                def run():
+                    if client.fail_milestone_writes:
+                        client.fail_milestone_writes -= 1
+                        raise RuntimeError("transient failure")
+                    client.milestones.update((row["user_id"], row["milestone_name"]) for row in rows)
+                return FakeQuery(run)
+
+        return Milestones()
+
+    def rpc(self, name, params):
+        def run():
+            if self.saved_elsewhere_before_next_save:
+                self.saved_elsewhere_before_next_save()
+                self.saved_elsewhere_before_next_save = None
+            conflicts = []
+            for row in params["p_rows"]:
+                _, current_version = self.counters.get(row["user_id"], (None, 0))
+                if current_version != row["version"]:
+                    conflicts.append(row["user_id"])
+                else:
+                    self.counters[row["user_id"]] = (row["counters"], current_version + 1)
+            return conflicts
+        return FakeQuery(run)
+
+
+def quiz_event():
+    return ActivityEvent(user_id=USER_ID, activity_type="quiz", topic="math", completed_quiz=True, score=1, total_questions=5)
+
+
+def test_failed_batch_does_not_lose_the_milestone():
+    supabase = FakeSupabase()
+    engine = MilestoneEngine()
+    supabase.fail_milestone_writes = 1
+
+    try:
+        asyncio.run(engine._process_batch(supabase, [quiz_event()]))
+    except RuntimeError:
+        pass
+    asyncio.run(engine._process_batch(supabase, [quiz_event()]))
+
+    assert (USER_ID, "First Quiz") in supabase.milestones
+    counters, _ = supabase.counters[USER_ID]
+    assert "First Quiz" in counters["awarded"]
+
+
+def test_concurrent_save_is_retried_on_top_of_the_other_workers_counts():
+    supabase = FakeSupabase()
+    engine = MilestoneEngine()
+
+    def other_worker_saves():
+        other = UserCounters(quizzes_completed=9, activity_counts={"quiz": 9})
+        supabase.counters[USER_ID] = (other.model_dump(mode="json"), 1)
+
+    supabase.saved_elsewhere_before_next_save = other_worker_saves
+    asyncio.run(engine._process_batch(supabase, [quiz_event()]))
+
+    counters, version = supabase.counters[USER_ID]
+    assert counters["quizzes_completed"] == 10
+    assert version == 2
+    assert (USER_ID, "Quiz Enthusiast") in supabase.milestones
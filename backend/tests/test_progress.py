@@ -0,0 +1,78 @@
+import asyncio
+import base64
+import uuid
+
+import pytest
+from fastapi import HTTPException
+
+from backend.api.progress import _decode_history_cursor, _encode_history_cursor, get_user_history
+from backend.models.models import User
+from backend.tests.fakes import FakeSupabase
+
+USER = User(id=uuid.UUID("00000000-0000-0000-0000-000000000001"), email="user@example.com")
+
+
+def history_row(row_id, created_at):
+    return {
+        "id": row_id,
+        "topic": "math",
+        "activity_type": "quiz",
+        "score": 4,
+        "total_questions": 5,
+        "created_at": created_at,
+    }
+
+
+def fetch_history(supabase, limit, cursor=None):
+    return asyncio.run(get_user_history(
+        limit=limit, cursor=cursor, activity_type=None, topic=None, current_user=USER, supabase=supabase,
+    ))
+
+
+def test_cursor_round_trip():
+    cursor = _encode_history_cursor(history_row(42, "2025-08-05T12:34:56.123456+00:00"))
+    assert _decode_history_cursor(cursor) == ("2025-08-05T12:34:56.123456+00:00", 42)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    base64.urlsafe_b64encode(b"{}").decode(),
+    base64.urlsafe_b64encode(b'["2025-08-05", "x"]').decode(),
+    base64.urlsafe_b64encode(b'["x\\",id.gt.0", 1]').decode(),
+    base64.urlsafe_b64encode(b"[5, 1]").decode(),
+])
+def test_bad_cursor_is_rejected_with_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        _decode_history_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_extra_row_produces_next_cursor_from_last_row_on_page():
+    rows = [history_row(3, "2025-08-05T12:00:03+00:00"), history_row(2, "2025-08-05T12:00:02+00:00"), history_row(1, "2025-08-05T12:00:01+00:00")]
+    supabase = FakeSupabase({"history": [rows]})
+
+    page = fetch_history(supabase, limit=2)
+
+    assert [item.id for item in page.items] == [3, 2]
+    assert _decode_history_cursor(page.next_cursor) == ("2025-08-05T12:00:02+00:00", 2)
+    query = supabase.queries_for("history")[0]
+    assert query.called("limit") == [(3,)]
+
+
+def test_last_page_has_no_next_cursor():
+    supabase = FakeSupabase({"history": [[history_row(1, "2025-08-05T12:00:01+00:00")]]})
+    page = fetch_history(supabase, limit=2)
+    assert page.next_cursor is None
+
+
+def test_cursor_bounds_the_scan_and_filters_ties():
+    supabase = FakeSupabase({"history": [[]]})
+    cursor = _encode_history_cursor(history_row(7, "2025-08-05T12:00:00+00:00"))
+
+    fetch_history(supabase, limit=2, cursor=cursor)
+
+    query = supabase.queries_for("history")[0]
+    assert query.called("lte") == [("created_at", "2025-08-05T12:00:00+00:00")]
+    assert query.called("or_") == [(
+        'created_at.lt."2025-08-05T12:00:00+00:00",and(created_at.eq."2025-08-05T12:00:00+00:00",id.lt.7)',
+    )]
@@ -1,11 +1,50 @@
-const API_BASE_URL = 'http://127.0.0.1:8000/api'; // Change to your deployed backend URL in production
+import { supabase } from './supabaseClient.js';
+import { clearCachedArtifacts, getCachedArtifact, markArtifactViewed, putCachedArtifact } from './contentCache.js';
 
-async function getAuthToken() {
-    const { data: { session } } = await supabase.auth.getSession();
-    return session ? session.access_token : null;
+export const API_BASE_URL = 'http://127.0.0.1:8000/api'; // Change to your deployed backend URL in production
+
+// Refresh the cached session this many seconds before the access token expires.
+const TOKEN_EXPIRY_MARGIN_SECONDS = 60;
+const LAST_TOPIC_KEY = 'eduassist:lastTopic';
+// The account the generated content cache currently belongs to.
+const CACHE_OWNER_KEY = 'eduassist:cacheOwner';
+
+// --- Auth token cache ---
+// Keeps the current session in memory so every request doesn't have to go through
+// supabase.auth.getSession(). Supabase pushes refreshed sessions through onAuthStateChange.
+let cachedSession = null;
+
+supabase.auth.onAuthStateChange((event, session) => {
+    cachedSession = session;
+    // The content cache is per browser, not per account: don't serve one user's
+    // generated content to whoever signs in next.
+    const userId = session?.user?.id;
+    if (event === 'SIGNED_OUT') {
+        localStorage.removeItem(CACHE_OWNER_KEY);
+        clearCachedArtifacts();
+    } else if (userId && localStorage.getItem(CACHE_OWNER_KEY) !== userId) {
+        localStorage.setItem(CACHE_OWNER_KEY, userId);
+        clearCachedArtifacts();
+    }
+});
+
+export async function getAuthToken() {
+    const nowSeconds = Date.now() / 1000;
+    const isExpiring = cachedSession?.expires_at && cachedSession.expires_at - TOKEN_EXPIRY_MARGIN_SECONDS < nowSeconds;
+    if (!cachedSession || isExpiring) {
+        const { data: { session } } = await supabase.auth.getSession();
+        cachedSession = session;
+    }
+    return cachedSession ? cachedSession.access_token : null;
 }
 
-async function fetchFromAPI(endpoint, options = {}) {
+/**
+ * Sends an authenticated request and returns the raw response.
+ * @param {string} url The full URL to request.
+ * @param {RequestInit} options Fetch options; headers are merged with the auth headers.
+ * @returns {Promise<Response|undefined>} The response, or undefined if the user was redirected to log in.
+ */
+export async function authorizedFetch(url, options = {}) {
     const token = await getAuthToken();
     if (!token) {
         console.error("No auth token found. Redirecting to login.");
@@ -19,7 +58,12 @@ async function fetchFromAPI(endpoint, options = {}) {
         ...options.headers,
     };
 
-    const response = await fetch(`${API_BASE_URL}${endpoint}`, { ...options, headers });
+    return fetch(url, { ...options, headers });
+}
+
+async function fetchFromAPI(endpoint, options = {}) {
+    const response = await authorizedFetch(`${API_BASE_URL}${endpoint}`, options);
+    if (!response) return;
 
     if (!response.ok) {
         const errorData = await response.json();
@@ -29,7 +73,139 @@ async function fetchFromAPI(endpoint, options = {}) {
     return response.json();
 }
 
-const api = {
+// --- Generated content cache ---
+
+// Where each study mode's content is generated (all are POST { topic }),
+// and the part of the response that gets cached and handed to the page.
+// Flashcards are not listed: they live in the user's stored deck (see api.getDueFlashcards).
+const STUDY_MODES = {
+    quiz: { endpoint: '/content/generate_quiz', extract: (data) => data.questions },
+    explanation: { endpoint: '/content/generate_explanation', extract: (data) => data },
+};
+
+/**
+ * Records the activity for a cached artifact the first time the user opens it, if it
+ * was prefetched: the backend logs nothing for prefetches (see prefetchStudyModes).
+ * @param {'quiz'|'explanation'} kind The study mode.
+ * @param {string} topic The topic.
+ * @param {{prefetched: boolean}|null} cached The cache entry being shown.
+ */
+export async function recordCachedView(kind, topic, cached) {
+    if (!cached?.prefetched) return;
+    await markArtifactViewed(kind, topic);
+    try {
+        const response = await authorizedFetch(`${API_BASE_URL}/content/log_view`, {
+            method: 'POST',
+            body: JSON.stringify({ topic, activity_type: kind }),
+        });
+        if (response && !response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+    } catch (error) {
+        console.warn(`[Cache] Could not record viewing ${kind} for "${topic}":`, error);
+    }
+}
+
+/**
+ * Returns generated content for a topic, from the local cache when possible.
+ * Fresh entries are served without a request; stale ones are revalidated with
+ * If-None-Match so the backend can answer 304 instead of regenerating.
+ * @param {'quiz'|'explanation'} kind The study mode.
+ * @param {string} topic The topic.
+ * @param {{prefetch?: boolean}} options Set `prefetch` for speculative requests, which
+ *   the backend doesn't record as activity until the content is opened.
+ * @returns {Promise<any>} The quiz questions or the explanation response.
+ */
+export async function getStudyContent(kind, topic, { prefetch = false } = {}) {
+    const cached = await getCachedArtifact(kind, topic);
+    if (cached?.fresh) {
+        if (!prefetch) await recordCachedView(kind, topic, cached);
+        return cached.data;
+    }
+
+    const headers = cached?.etag ? { 'If-None-Match': cached.etag } : {};
+    if (prefetch) headers['Purpose'] = 'prefetch';
+    const response = await authorizedFetch(`${API_BASE_URL}${STUDY_MODES[kind].endpoint}`, {
+        method: 'POST',
+        headers,
+        body: JSON.stringify({ topic }),
+    });
+    if (!response) return;
+
+    if (response.status === 304 && cached) {
+        await putCachedArtifact(kind, topic, cached.data, cached.etag, cached.prefetched);
+        if (!prefetch) await recordCachedView(kind, topic, cached);
+        return cached.data;
+    }
+    if (!response.ok) {
+        const errorData = await response.json().catch(() => ({}));
+        throw new Error(errorData.detail || `HTTP error! status: ${response.status}`);
+    }
+
+    const data = STUDY_MODES[kind].extract(await response.json());
+    await putCachedArtifact(kind, topic, data, response.headers.get('ETag'), prefetch);
+    return data;
+}
+
+/**
+ * Remembers the topic a study mode was started with, so the other pages can pre-fill it.
+ * @param {string} topic The topic.
+ */
+export function rememberTopic(topic) {
+    sessionStorage.setItem(LAST_TOPIC_KEY, topic);
+}
+
+export function getLastTopic() {
+    return sessionStorage.getItem(LAST_TOPIC_KEY) || '';
+}
+
+let premiumStatus = null;
+
+/**
+ * Whether the signed-in user has premium, looked up once per page.
+ * @returns {Promise<boolean>}
+ */
+async function isPremiumUser() {
+    if (premiumStatus === null) {
+        await getAuthToken();
+        const userId = cachedSession?.user?.id;
+        if (!userId) return false;
+        const { data } = await supabase.from('profiles').select('is_premium').eq('id', userId).single();
+        premiumStatus = Boolean(data?.is_premium);
+    }
+    return premiumStatus;
+}
+
+/**
+ * Speculatively generates the other study modes for a topic while the browser is idle,
+ * so switching from e.g. the quiz to the explanation is instant.
+ * Only done for premium users, since every generation counts against the free tier limit,
+ * and skipped on data-saver connections and for anything already cached. Prefetches are
+ * marked with `Purpose: prefetch` and only count as activity once opened.
+ * @param {string} topic The topic the user just entered.
+ * @param {string} currentKind The study mode the user is already on.
+ */
+export async function prefetchStudyModes(topic, currentKind) {
+    if (navigator.connection?.saveData) return;
+    if (!(await isPremiumUser())) return;
+    const schedule = window.requestIdleCallback || ((callback) => setTimeout(callback, 2000));
+
+    Object.keys(STUDY_MODES)
+        .filter((kind) => kind !== currentKind)
+        .forEach((kind) => {
+            schedule(async () => {
+                try {
+                    const cached = await getCachedArtifact(kind, topic);
+                    if (cached?.fresh) return;
+                    await getStudyContent(kind, topic, { prefetch: true });
+                    console.log(`[Prefetch] Cached ${kind} for "${topic}"`);
+                } catch (error) {
+                    // Prefetching is best effort; the page will fetch on demand instead.
+                    console.warn(`[Prefetch] Could not prefetch ${kind} for "${topic}":`, error);
+                }
+            });
+        });
+}
+
+export const api = {
     getDashboardData: () => fetchFromAPI('/progress/dashboard_data'),
     generateQuiz: (topic) => fetchFromAPI('/content/generate_quiz', {
         method: 'POST',
@@ -39,6 +215,13 @@ const api = {
         method: 'POST',
         body: JSON.stringify({ topic }),
     }),
+    getDueFlashcards: (topic) => fetchFromAPI(`/flashcards/due?topic=${encodeURIComponent(topic)}`),
+    // keepalive lets the request finish when it is sent while the page is being left.
+    submitFlashcardReviews: (reviews) => fetchFromAPI('/flashcards/reviews', {
+        method: 'POST',
+        body: JSON.stringify({ reviews }),
+        keepalive: true,
+    }),
     trackQuizResult: (topic, score, total_questions) => fetchFromAPI('/progress/track_quiz_result', {
         method: 'POST',
         body: JSON.stringify({ topic, score, total_questions }),
@@ -46,4 +229,4 @@ const api = {
     createCheckoutSession: () => fetchFromAPI('/payments/create_checkout_session', {
         method: 'POST',
     }),
-};
\ No newline at end of file
+};
@@ -0,0 +1,119 @@
+// --- IndexedDB cache for generated study content ---
+// Artifacts (quizzes and explanations) are stored per topic together with
+// the ETag the backend sent, so stale entries can be revalidated instead of regenerated.
+// The store belongs to whoever is signed in and is cleared when that changes (see api.js).
+
+const DB_NAME = 'eduassist-cache';
+const DB_VERSION = 1;
+const STORE_NAME = 'artifacts';
+
+// Bump this when the shape of cached artifacts changes; older entries are then ignored.
+export const CACHE_VERSION = 2;
+// Entries younger than this are served without contacting the backend at all.
+// Keep it well below the backend's ETag TTL (30 days) so revalidating a stale entry can still get a 304.
+const MAX_AGE_MS = 24 * 60 * 60 * 1000;
+
+let dbPromise = null;
+
+/**
+ * Opens (and on first use creates) the cache database.
+ * @returns {Promise<IDBDatabase|null>} The database, or null if IndexedDB is unavailable.
+ */
+function openDatabase() {
+    if (!dbPromise) {
+        dbPromise = new Promise((resolve) => {
+            if (!('indexedDB' in window)) {
+                resolve(null);
+                return;
+            }
+            const request = indexedDB.open(DB_NAME, DB_VERSION);
+            request.onupgradeneeded = () => {
+                request.result.createObjectStore(STORE_NAME, { keyPath: 'key' });
+            };
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => {
+                console.warn('[Cache] IndexedDB unavailable, caching disabled:', request.error);
+                resolve(null);
+            };
+        });
+    }
+    return dbPromise;
+}
+
+/**
+ * Runs a single request against the artifacts store.
+ * @param {IDBTransactionMode} mode The transaction mode.
+ * @param {function(IDBObjectStore): IDBRequest} operation Builds the request.
+ * @returns {Promise<any>} The request result, or null if the cache is unavailable.
+ */
+async function withStore(mode, operation) {
+    const db = await openDatabase();
+    if (!db) return null;
+    return new Promise((resolve) => {
+        const request = operation(db.transaction(STORE_NAME, mode).objectStore(STORE_NAME));
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => {
+            console.warn('[Cache] IndexedDB request failed:', request.error);
+            resolve(null);
+        };
+    });
+}
+
+function cacheKey(kind, topic) {
+    return `${kind}:${topic.trim().toLowerCase()}`;
+}
+
+/**
+ * Looks up a cached artifact.
+ * @param {string} kind The study mode, 'quiz' or 'explanation'.
+ * @param {string} topic The topic the artifact was generated for.
+ * @returns {Promise<{data: any, etag: string|null, fresh: boolean, prefetched: boolean}|null>}
+ *   The entry, or null on a miss. `prefetched` stays set until the user has opened it.
+ */
+export async function getCachedArtifact(kind, topic) {
+    const entry = await withStore('readonly', (store) => store.get(cacheKey(kind, topic)));
+    if (!entry || entry.version !== CACHE_VERSION) return null;
+    return {
+        data: entry.data,
+        etag: entry.etag,
+        fresh: Date.now() - entry.storedAt < MAX_AGE_MS,
+        prefetched: Boolean(entry.prefetched),
+    };
+}
+
+/**
+ * Stores (or replaces) an artifact for a topic.
+ * @param {string} kind The study mode.
+ * @param {string} topic The topic the artifact was generated for.
+ * @param {any} data The artifact itself.
+ * @param {string|null} etag The validator the backend sent with it, if any.
+ * @param {boolean} prefetched Whether it was generated speculatively rather than opened by the user.
+ */
+export async function putCachedArtifact(kind, topic, data, etag = null, prefetched = false) {
+    await withStore('readwrite', (store) => store.put({
+        key: cacheKey(kind, topic),
+        version: CACHE_VERSION,
+        storedAt: Date.now(),
+        etag,
+        prefetched,
+        data,
+    }));
+}
+
+/**
+ * Records that the user has opened a prefetched artifact, without changing its age.
+ * @param {string} kind The study mode.
+ * @param {string} topic The topic the artifact was generated for.
+ */
+export async function markArtifactViewed(kind, topic) {
+    const entry = await withStore('readonly', (store) => store.get(cacheKey(kind, topic)));
+    if (!entry?.prefetched) return;
+    await withStore('readwrite', (store) => store.put({ ...entry, prefetched: false }));
+}
+
+/**
+ * Removes every cached artifact, e.g. when the user signs out.
+ */
+export async function clearCachedArtifacts() {
+    await withStore('readwrite', (store) => store.clear());
+}
@@ -1,5 +1,4 @@
-// --- Constants ---
-const API_BASE_URL = 'http://localhost:8000/api';
+import { getLastTopic, getStudyContent, prefetchStudyModes, rememberTopic } from './api.js';
 
 // --- DOM Elements ---
 const topicForm = document.getElementById('topic-form');
@@ -20,6 +19,7 @@ const cancelExitButton = document.getElementById('cancel-exit-button');
 
 // --- Event Listeners ---
 topicForm.addEventListener('submit', handleTopicSubmit);
+topicInput.value = getLastTopic();
 
 
 /**
@@ -59,30 +59,14 @@ async function handleTopicSubmit(event) {
     followUpForm.classList.add('hidden');
 
     try {
-        const token = localStorage.getItem('accessToken');
-        if (!token) {
-            throw new Error('Authentication error. Please log in again.');
-        }
-
-        const response = await fetch(`${API_BASE_URL}/content/generate_explanation`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-                'Authorization': `Bearer ${token}`
-            },
-            body: JSON.stringify({ topic })
-        });
-
-        if (!response.ok) {
-            const errorData = await response.json().catch(() => ({ detail: 'An unknown server error occurred.' }));
-            const errorDetail = errorData.detail || 'Failed to generate explanation.';
-            throw new Error(errorDetail);
-        }
-
-        const responseData = await response.json();
+        rememberTopic(topic);
+        // Served from the local cache when this topic was already explained or prefetched.
+        const responseData = await getStudyContent('explanation', topic);
+        if (!responseData) return;
         populateExplanation(responseData.topic, responseData.explanation);
         explanationInterface.classList.remove('hidden');
         followUpForm.classList.remove('hidden');
+        prefetchStudyModes(topic, 'explanation');
 
     } catch (error) {
         console.error('Error generating explanation:', error);
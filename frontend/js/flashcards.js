@@ -1,7 +1,34 @@
-document.addEventListener('DOMContentLoaded', () => {
-    // --- Configuration ---
-    const API_BASE_URL = 'http://localhost:8000'; // Your FastAPI backend URL
+import { readNDJSON } from './ndjson.js';
+import { API_BASE_URL, api, authorizedFetch, getLastTopic, prefetchStudyModes, rememberTopic } from './api.js';
+
+// SM-2 recall grades sent for the buttons on the back of a card.
+const REVIEW_GRADES = [
+    { label: 'Again', grade: 1 },
+    { label: 'Good', grade: 4 },
+    { label: 'Easy', grade: 5 },
+];
+
+/**
+ * Asks the AI for new cards for the user's deck and calls `onCard` for each one
+ * as soon as it has been stored, so it can be studied while the rest are generated.
+ * @param {string} topic The deck's topic.
+ * @param {function(object): void} onCard Called with each new due card.
+ * @returns {Promise<number>} A promise that resolves to the number of cards added.
+ */
+async function streamNewFlashcards(topic, onCard) {
+    const response = await authorizedFetch(`${API_BASE_URL}/flashcards/decks/extend/stream`, {
+        method: 'POST',
+        body: JSON.stringify({ topic }),
+    });
+    if (!response) return 0;
+    if (!response.ok) {
+        const errorData = await response.json().catch(() => ({ detail: 'Failed to parse error response.' }));
+        throw new Error(errorData.detail || `HTTP error! status: ${response.status}`);
+    }
+    return readNDJSON(response, onCard);
+}
 
+document.addEventListener('DOMContentLoaded', () => {
     // --- DOM Elements ---
     const topicForm = document.getElementById('topic-form');
     const topicInput = document.getElementById('topic-input');
@@ -18,10 +45,19 @@ document.addEventListener('DOMContentLoaded', () => {
     const confirmExitButton = document.getElementById('confirm-exit-button');
     const cancelExitButton = document.getElementById('cancel-exit-button');
 
+    // Grades given in this session that haven't been sent yet, by card id.
+    const pendingReviews = new Map();
+    let shownCardCount = 0;
+
     // --- Event Listeners ---
+    // Send grades the user gave before leaving the page.
+    window.addEventListener('pagehide', flushReviews);
     if (topicForm) {
         topicForm.addEventListener('submit', handleTopicSubmit);
     }
+    if (topicInput) {
+        topicInput.value = getLastTopic();
+    }
 
     /**
      * Handles the submission of the initial topic.
@@ -42,42 +78,26 @@ document.addEventListener('DOMContentLoaded', () => {
         }
 
         try {
-            // --- API Call to the FastAPI backend ---
-            const response = await fetch(`${API_BASE_URL}/generate_flashcards`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'Authorization': `Bearer ${localStorage.getItem('accessToken')}`
-                },
-                body: JSON.stringify({ topic: topic })
-            });
-
-            if (!response.ok) {
-                let errorDetail = 'Failed to generate flashcards. The server returned an error.';
-                try {
-                    const errorData = await response.json();
-                    // FastAPI validation errors are often in errorData.detail.
-                    // It can be a string or an array of objects.
-                    if (errorData && errorData.detail) {
-                        errorDetail = typeof errorData.detail === 'string' ? errorData.detail : JSON.stringify(errorData.detail, null, 2);
-                    }
-                } catch (e) { /* Response was not JSON, use the default error message. */ }
-                throw new Error(errorDetail);
-            }
-
-            const responseData = await response.json();
-
-            // The backend might return a wrapped object { "flashcards": [...] } or just the array [...].
-            // This handles both cases to be robust.
-            const flashcardsArray = Array.isArray(responseData) ? responseData : responseData.flashcards;
-
-            // Final check to ensure we ended up with a valid array.
-            if (!Array.isArray(flashcardsArray)) {
-                console.error("Could not find a valid 'flashcards' array in the server response:", responseData);
-                throw new Error('The server response did not contain a valid list of flashcards. See console for details.');
+            rememberTopic(topic);
+            // Cards already in the deck are reviewed first. The AI is only asked for new
+            // material (excluding what the deck already has) when nothing is due.
+            const due = await api.getDueFlashcards(topic);
+            if (!due) return;
+            populateFlashcards(due.cards);
+            if (due.cards.length === 0) {
+                // New cards are shown as they stream in; the spinner stays until the last one.
+                if (flashcardContainer) flashcardContainer.innerHTML = '';
+                flashcardContainer?.classList.remove('hidden');
+                const added = await streamNewFlashcards(topic, (card) => {
+                    shownCardCount++;
+                    appendFlashcard(card);
+                });
+                if (added === 0) {
+                    populateFlashcards([]);
+                    return;
+                }
             }
-            populateFlashcards(flashcardsArray);
-
+            prefetchStudyModes(topic, 'flashcards');
         } catch (error) {
             console.error('Error generating flashcards:', error);
             if (flashcardContainer) {
@@ -98,32 +118,76 @@ document.addEventListener('DOMContentLoaded', () => {
     function populateFlashcards(flashcards) {
         if (!flashcardContainer) return;
         flashcardContainer.innerHTML = ''; // Clear previous content
+        shownCardCount = flashcards ? flashcards.length : 0;
         if (!flashcards || flashcards.length === 0) {
             flashcardContainer.innerHTML = `<p class="text-gray-500 text-center col-span-full">No flashcards generated for this topic.</p>`;
             return;
         }
 
-        flashcards.forEach(cardData => {
-            const cardElement = document.createElement('div');
-            // The backend model was updated from {front, back} to {question, answer}.
-            // We check for both to be robust against different backend versions.
-            const question = cardData.question || cardData.front;
-            const answer = cardData.answer || cardData.back;
-
-            cardElement.className = 'flashcard relative h-64 bg-white dark:bg-gray-800 p-6 rounded-xl shadow-lg cursor-pointer transition-transform duration-500 [transform-style:preserve-3d]';
-            cardElement.innerHTML = `
-                <div class="front absolute inset-0 w-full h-full flex items-center justify-center bg-white dark:bg-gray-800 rounded-xl [backface-visibility:hidden]">
-                    <p class="text-xl font-semibold text-center p-4">${question || 'Error: Question not found'}</p>
-                </div>
-                <div class="back absolute inset-0 w-full h-full flex items-center justify-center bg-red-100 dark:bg-red-900/50 rounded-xl [backface-visibility:hidden] [transform:rotateY(180deg)]">
-                    <p class="text-md p-4 text-center">${answer || 'Error: Answer not found'}</p>
-                </div>
-            `;
-            cardElement.addEventListener('click', () => {
-                cardElement.classList.toggle('is-flipped');
+        flashcards.forEach(appendFlashcard);
+    }
+
+    /**
+     * Creates a single flashcard element and appends it to the container.
+     * @param {object} cardData - A due card with `id`, `question` and `answer`.
+     */
+    function appendFlashcard(cardData) {
+        if (!flashcardContainer) return;
+        const cardElement = document.createElement('div');
+        const { question, answer } = cardData;
+
+        cardElement.className = 'flashcard relative h-64 bg-white dark:bg-gray-800 p-6 rounded-xl shadow-lg cursor-pointer transition-transform duration-500 [transform-style:preserve-3d]';
+        cardElement.innerHTML = `
+            <div class="front absolute inset-0 w-full h-full flex items-center justify-center bg-white dark:bg-gray-800 rounded-xl [backface-visibility:hidden]">
+                <p class="text-xl font-semibold text-center p-4">${question || 'Error: Question not found'}</p>
+            </div>
+            <div class="back absolute inset-0 w-full h-full flex flex-col items-center justify-center bg-red-100 dark:bg-red-900/50 rounded-xl [backface-visibility:hidden] [transform:rotateY(180deg)]">
+                <p class="text-md p-4 text-center">${answer || 'Error: Answer not found'}</p>
+                <div class="review-buttons flex gap-2"></div>
+            </div>
+        `;
+        const reviewButtons = cardElement.querySelector('.review-buttons');
+        REVIEW_GRADES.forEach(({ label, grade }) => {
+            const button = document.createElement('button');
+            button.type = 'button';
+            button.textContent = label;
+            button.className = 'py-1 px-3 rounded-lg text-sm font-semibold bg-white dark:bg-gray-700 hover:bg-gray-200 dark:hover:bg-gray-600';
+            button.addEventListener('click', (event) => {
+                event.stopPropagation(); // Grading shouldn't flip the card back.
+                gradeCard(cardData.id, grade, cardElement);
             });
-            flashcardContainer.appendChild(cardElement);
+            reviewButtons.appendChild(button);
+        });
+        cardElement.addEventListener('click', () => {
+            cardElement.classList.toggle('is-flipped');
         });
+        flashcardContainer.appendChild(cardElement);
+    }
+
+    /**
+     * Records a grade for a card. Grades are sent in one batch once every card
+     * on screen has been graded, or when the session ends.
+     * @param {number} cardId The card's id.
+     * @param {number} grade The SM-2 recall grade (0-5).
+     * @param {HTMLElement} cardElement The card, dimmed once graded.
+     */
+    function gradeCard(cardId, grade, cardElement) {
+        pendingReviews.set(cardId, grade);
+        cardElement.classList.add('opacity-50');
+        if (pendingReviews.size >= shownCardCount) {
+            flushReviews();
+        }
+    }
+
+    async function flushReviews() {
+        if (pendingReviews.size === 0) return;
+        const reviews = [...pendingReviews].map(([card_id, grade]) => ({ card_id, grade }));
+        pendingReviews.clear();
+        try {
+            await api.submitFlashcardReviews(reviews);
+        } catch (error) {
+            console.error('Error saving flashcard reviews:', error);
+        }
     }
 
     /**
@@ -167,6 +231,7 @@ document.addEventListener('DOMContentLoaded', () => {
             exitFlashcardsButton.addEventListener('click', handleExit);
             confirmExitButton.addEventListener('click', () => {
                 closeExitModal();
+                flushReviews();
                 resetView();
             });
             cancelExitButton.addEventListener('click', closeExitModal);
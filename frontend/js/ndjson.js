@@ -0,0 +1,39 @@
+/**
+ * Reads a newline-delimited JSON (NDJSON) response body and calls `onItem`
+ * for every parsed line as soon as it arrives.
+ * A line of the form { "error": "..." } is turned into a thrown Error, since
+ * the backend can no longer change the HTTP status once streaming has started.
+ * @param {Response} response A successful fetch response with an NDJSON body.
+ * @param {function(object): void} onItem Called once per parsed item.
+ * @returns {Promise<number>} The number of items delivered.
+ */
+export async function readNDJSON(response, onItem) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let count = 0;
+
+    const handleLine = (line) => {
+        if (!line.trim()) return;
+        const item = JSON.parse(line);
+        if (item && item.error) {
+            throw new Error(item.error);
+        }
+        count++;
+        onItem(item);
+    };
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let newlineIndex;
+        while ((newlineIndex = buffer.indexOf('\n')) !== -1) {
+            handleLine(buffer.slice(0, newlineIndex));
+            buffer = buffer.slice(newlineIndex + 1);
+        }
+    }
+    handleLine(buffer + decoder.decode());
+    return count;
+}
@@ -1,4 +1,7 @@
 import { supabase } from './supabaseClient.js';
+import { readNDJSON } from './ndjson.js';
+import { API_BASE_URL, authorizedFetch, getLastTopic, prefetchStudyModes, recordCachedView, rememberTopic } from './api.js';
+import { getCachedArtifact, putCachedArtifact } from './contentCache.js';
 
 // --- DOM Elements ---
 const topicForm = document.getElementById('topic-form');
@@ -21,28 +24,28 @@ const cancelExitButton = document.getElementById('cancel-exit-button');
 let questions = [];
 let currentTopic = '';
 
-const BACKEND_URL = 'http://127.0.0.1:8000';
-
 /**
- * Fetches quiz questions from the backend API.
+ * Streams quiz questions from the backend API, delivering each one as soon as it is generated.
  * @param {string} topic The topic for the quiz.
- * @returns {Promise<object[]>} A promise that resolves to an array of question objects.
+ * @param {function(object, number): void} onQuestion Called with each question object and its index.
+ * @returns {Promise<number>} A promise that resolves to the number of questions received.
  */
-async function generateQuizFromAPI(topic) {
-    console.log(`[API] Generating quiz for: "${topic}"`);
+async function streamQuizFromAPI(topic, onQuestion) {
+    console.log(`[API] Streaming quiz for: "${topic}"`);
     try {
-        const response = await fetch(`${BACKEND_URL}/generate_quiz`, {
+        const response = await authorizedFetch(`${API_BASE_URL}/content/generate_quiz/stream`, {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({ topic }),
         });
+        if (!response) return 0;
         if (!response.ok) {
             const errorData = await response.json().catch(() => ({ detail: 'Failed to parse error response.' }));
             throw new Error(errorData.detail || `HTTP error! status: ${response.status}`);
         }
-        return await response.json();
+        let index = 0;
+        return await readNDJSON(response, (question) => onQuestion(question, index++));
     } catch (error) {
-        console.error("Error fetching quiz from API:", error);
+        console.error("Error streaming quiz from API:", error);
         throw error;
     }
 }
@@ -67,47 +70,61 @@ function createButton(text, type, classNames, clickHandler) {
 }
 
 /**
- * Renders the quiz questions and options into a form.
- * @param {object[]} newQuestions The array of question objects.
+ * Clears any previous quiz so questions can be appended as they stream in.
  */
-function renderQuiz(newQuestions) {
-    questions = newQuestions; // Store questions for submission handling
+function resetQuiz() {
+    questions = [];
     questionsContainer.innerHTML = ''; // Clear previous questions
     quizActionsEl.innerHTML = ''; // Clear previous actions
+}
 
-    questions.forEach((q, index) => {
-        const questionBlock = document.createElement('div');
-        questionBlock.className = 'question-block';
-
-        const questionText = document.createElement('p');
-        questionText.className = 'font-semibold text-lg mb-2';
-        questionText.textContent = `${index + 1}. ${q.question}`;
-        questionBlock.appendChild(questionText);
-
-        const optionsList = document.createElement('div');
-        optionsList.className = 'space-y-2';
-        q.options.forEach(option => {
-            const label = document.createElement('label');
-            label.className = 'block p-3 rounded-lg bg-gray-100 dark:bg-gray-700 hover:bg-gray-200 dark:hover:bg-gray-600 cursor-pointer';
-
-            const radio = document.createElement('input');
-            radio.type = 'radio';
-            radio.name = `question-${index}`;
-            radio.value = option;
-            radio.className = 'mr-2';
-            radio.required = true;
-
-            const span = document.createElement('span');
-            span.textContent = option;
-
-            label.appendChild(radio);
-            label.appendChild(span);
-            optionsList.appendChild(label);
-        });
-        questionBlock.appendChild(optionsList);
-        questionsContainer.appendChild(questionBlock);
+/**
+ * Appends a single question and its options to the quiz form.
+ * The form is revealed as soon as the first question arrives.
+ * @param {object} q The question object.
+ * @param {number} index The position of the question in the quiz.
+ */
+function renderQuestion(q, index) {
+    questions[index] = q; // Store questions for submission handling
+
+    const questionBlock = document.createElement('div');
+    questionBlock.className = 'question-block';
+
+    const questionText = document.createElement('p');
+    questionText.className = 'font-semibold text-lg mb-2';
+    questionText.textContent = `${index + 1}. ${q.question_text}`;
+    questionBlock.appendChild(questionText);
+
+    const optionsList = document.createElement('div');
+    optionsList.className = 'space-y-2';
+    q.options.forEach(option => {
+        const label = document.createElement('label');
+        label.className = 'block p-3 rounded-lg bg-gray-100 dark:bg-gray-700 hover:bg-gray-200 dark:hover:bg-gray-600 cursor-pointer';
+
+        const radio = document.createElement('input');
+        radio.type = 'radio';
+        radio.name = `question-${index}`;
+        radio.value = option;
+        radio.className = 'mr-2';
+        radio.required = true;
+
+        const span = document.createElement('span');
+        span.textContent = option;
+
+        label.appendChild(radio);
+        label.appendChild(span);
+        optionsList.appendChild(label);
     });
+    questionBlock.appendChild(optionsList);
+    questionsContainer.appendChild(questionBlock);
 
+    quizFormEl.classList.remove('hidden');
+}
+
+/**
+ * Adds the exit and submit buttons once every question has arrived.
+ */
+function renderQuizActions() {
     // Create Exit Button
     const exitButton = createButton(
         'Exit Quiz',
@@ -124,9 +141,6 @@ function renderQuiz(newQuestions) {
         'font-bold py-3 px-6 rounded-lg focus:outline-none focus:shadow-outline shadow-md hover:shadow-lg transition-all duration-300 bg-red-600 hover:bg-red-700 text-white dark:bg-red-500 dark:hover:bg-red-600'
     );
     quizActionsEl.appendChild(submitButton);
-
-    loadingSpinner.classList.add('hidden');
-    quizFormEl.classList.remove('hidden');
 }
 
 /**
@@ -142,7 +156,7 @@ async function handleSubmitQuiz(e) {
     let correctAnswers = 0;
 
     questions.forEach((q, index) => {
-        if (formData.get(`question-${index}`) === q.answer) {
+        if (formData.get(`question-${index}`) === q.correct_answer) {
             correctAnswers++;
         }
     });
@@ -214,6 +228,8 @@ async function main() {
         return;
     }
 
+    topicInput.value = getLastTopic();
+
     topicForm.addEventListener('submit', async (e) => {
         e.preventDefault();
         const topic = topicInput.value.trim();
@@ -230,8 +246,23 @@ async function main() {
         quizResultsEl.classList.add('hidden');
 
         try {
-            const generatedQuestions = await generateQuizFromAPI(topic);
-            renderQuiz(generatedQuestions);
+            resetQuiz();
+            rememberTopic(topic);
+            const cached = await getCachedArtifact('quiz', topic);
+            if (cached?.fresh) {
+                cached.data.forEach(renderQuestion);
+                await recordCachedView('quiz', topic, cached);
+            } else {
+                // The spinner stays visible while the remaining questions are still streaming in.
+                await streamQuizFromAPI(topic, renderQuestion);
+                // Nothing arrives when the user was redirected to log in; don't cache an empty quiz.
+                if (questions.length > 0) {
+                    await putCachedArtifact('quiz', topic, questions);
+                }
+            }
+            loadingSpinner.classList.add('hidden');
+            prefetchStudyModes(topic, 'quiz');
+            renderQuizActions();
         } catch (error) {
             loadingSpinner.classList.add('hidden');
             quizContainer.innerHTML = `<p class="text-red-500 text-center font-semibold">Failed to generate quiz: ${error.message}</p>`;
@@ -0,0 +1,20 @@
+-- Composite indexes for the per-user queries issued by the progress API.
+
+-- Keyset pagination of /progress/history: newest first, (created_at, id) as the cursor.
+CREATE INDEX IF NOT EXISTS history_user_id_created_at_idx
+ON public.history (user_id, created_at DESC, id DESC);
+
+-- /progress/history filtered by activity type or topic.
+CREATE INDEX IF NOT EXISTS history_user_id_activity_type_created_at_idx
+ON public.history (user_id, activity_type, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS history_user_id_topic_created_at_idx
+ON public.history (user_id, topic, created_at DESC, id DESC);
+
+-- track_quiz_result looks up the progress row for a single topic.
+CREATE INDEX IF NOT EXISTS user_progress_user_id_topic_idx
+ON public.user_progress (user_id, topic);
+
+-- track_quiz_result checks whether a milestone has already been awarded.
+CREATE INDEX IF NOT EXISTS milestones_user_id_milestone_name_idx
+ON public.milestones (user_id, milestone_name);
@@ -0,0 +1,126 @@
+-- Per-user running counters for the milestone rules engine.
+-- `version` is bumped on every save so concurrent workers can detect lost updates.
+CREATE TABLE IF NOT EXISTS public.user_counters (
+  user_id uuid NOT NULL,
+  counters jsonb NOT NULL DEFAULT '{}'::jsonb,
+  version bigint NOT NULL DEFAULT 1,
+  updated_at timestamptz NOT NULL DEFAULT now(),
+  CONSTRAINT user_counters_pkey PRIMARY KEY (user_id),
+  CONSTRAINT user_counters_user_id_fkey FOREIGN KEY (user_id) REFERENCES auth.users(id) ON DELETE CASCADE
+);
+
+-- Only the backend (service role) reads and writes counters.
+ALTER TABLE public.user_counters ENABLE ROW LEVEL SECURITY;
+
+-- The old select-then-insert check in track_quiz_result could award the same milestone
+-- twice under concurrent requests. Keep the earliest row so the unique index can be built.
+DELETE FROM public.milestones
+WHERE ctid IN (
+  SELECT ctid FROM (
+    SELECT ctid,
+           row_number() OVER (PARTITION BY user_id, milestone_name ORDER BY achieved_at NULLS LAST, ctid) AS rn
+    FROM public.milestones
+  ) ranked
+  WHERE rn > 1
+);
+
+-- Each milestone is awarded once per user; batched inserts upsert against this.
+DROP INDEX IF EXISTS public.milestones_user_id_milestone_name_idx;
+CREATE UNIQUE INDEX IF NOT EXISTS milestones_user_id_milestone_name_key
+ON public.milestones (user_id, milestone_name);
+
+-- Backfill counters from existing activity so count-based milestones (e.g. "Quiz Master")
+-- continue from the user's real totals instead of starting at 0.
+-- Completed quizzes are the history rows written by track_quiz_result (they carry a score).
+WITH activity AS (
+  SELECT user_id, activity_type, topic, created_at
+  FROM public.history
+  WHERE activity_type IN ('flashcard', 'explanation', 'discussion')
+     OR (activity_type = 'quiz' AND score IS NOT NULL)
+),
+activity_counts AS (
+  SELECT user_id, jsonb_object_agg(activity_type, n) AS counts
+  FROM (SELECT user_id, activity_type, count(*) AS n FROM activity GROUP BY user_id, activity_type) t
+  GROUP BY user_id
+),
+quizzes AS (
+  SELECT user_id, sum(n) AS total, jsonb_object_agg(topic, n) AS by_topic
+  FROM (SELECT user_id, topic, count(*) AS n FROM activity WHERE activity_type = 'quiz' GROUP BY user_id, topic) t
+  GROUP BY user_id
+),
+active_days AS (
+  SELECT DISTINCT user_id, (created_at AT TIME ZONE 'UTC')::date AS day FROM activity
+),
+-- Consecutive days share the same (day - row number), which identifies each streak.
+streaks AS (
+  SELECT user_id, max(day) AS last_day, count(*) AS days
+  FROM (
+    SELECT user_id, day, day - (row_number() OVER (PARTITION BY user_id ORDER BY day))::int AS streak_id
+    FROM active_days
+  ) t
+  GROUP BY user_id, streak_id
+),
+latest_streaks AS (
+  SELECT DISTINCT ON (user_id) user_id, last_day, days
+  FROM streaks
+  ORDER BY user_id, last_day DESC
+),
+awarded AS (
+  SELECT user_id, jsonb_agg(milestone_name ORDER BY milestone_name) AS names
+  FROM public.milestones
+  GROUP BY user_id
+)
+INSERT INTO public.user_counters (user_id, counters)
+SELECT u.id,
+       jsonb_build_object(
+         'activity_counts', coalesce(ac.counts, '{}'::jsonb),
+         'quizzes_completed', coalesce(q.total, 0),
+         'quizzes_by_topic', coalesce(q.by_topic, '{}'::jsonb),
+         'last_active_on', s.last_day,
+         'current_streak', coalesce(s.days, 0),
+         'awarded', coalesce(a.names, '[]'::jsonb)
+       )
+FROM auth.users u
+LEFT JOIN activity_counts ac ON ac.user_id = u.id
+LEFT JOIN quizzes q ON q.user_id = u.id
+LEFT JOIN latest_streaks s ON s.user_id = u.id
+LEFT JOIN awarded a ON a.user_id = u.id
+WHERE ac.user_id IS NOT NULL OR a.user_id IS NOT NULL
+ON CONFLICT (user_id) DO NOTHING;
+
+
+-- Saves a batch of counters with optimistic concurrency.
+-- p_rows is a JSON array of {"user_id": ..., "counters": {...}, "version": ...}, where version
+-- is the value that was read (0 if the user had no row). A row is only written if nobody
+-- else saved it in the meantime. Returns the user ids that were not written.
+CREATE OR REPLACE FUNCTION public.save_user_counters(p_rows jsonb)
+RETURNS uuid[]
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+DECLARE
+  r jsonb;
+  conflicts uuid[] := '{}';
+BEGIN
+  FOR r IN SELECT * FROM jsonb_array_elements(p_rows) LOOP
+    IF (r->>'version')::bigint = 0 THEN
+      INSERT INTO user_counters (user_id, counters)
+      VALUES ((r->>'user_id')::uuid, r->'counters')
+      ON CONFLICT (user_id) DO NOTHING;
+    ELSE
+      UPDATE user_counters
+      SET counters = r->'counters', version = version + 1, updated_at = now()
+      WHERE user_id = (r->>'user_id')::uuid AND version = (r->>'version')::bigint;
+    END IF;
+
+    IF NOT FOUND THEN
+      conflicts := conflicts || (r->>'user_id')::uuid;
+    END IF;
+  END LOOP;
+  RETURN conflicts;
+END;
+$$;
+
+-- Only the backend may call this; it is not exposed to browser clients through PostgREST.
+REVOKE EXECUTE ON FUNCTION public.save_user_counters(jsonb) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.save_user_counters(jsonb) TO service_role;
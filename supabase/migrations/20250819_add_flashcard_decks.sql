@@ -0,0 +1,106 @@
+-- Stored flashcard decks with per-card spaced-repetition (SM-2) state.
+
+CREATE TABLE IF NOT EXISTS public.flashcard_decks (
+  id bigint generated by default as identity,
+  user_id uuid NOT NULL,
+  topic text NOT NULL,
+  created_at timestamptz NOT NULL DEFAULT now(),
+  CONSTRAINT flashcard_decks_pkey PRIMARY KEY (id),
+  CONSTRAINT flashcard_decks_user_id_topic_key UNIQUE (user_id, topic),
+  CONSTRAINT flashcard_decks_user_id_fkey FOREIGN KEY (user_id) REFERENCES auth.users(id) ON DELETE CASCADE
+);
+
+-- Review state is kept in small integer columns next to the card:
+-- ease is the SM-2 easiness factor x100 (250 = 2.5), interval_days the current gap.
+CREATE TABLE IF NOT EXISTS public.flashcards (
+  id bigint generated by default as identity,
+  deck_id bigint NOT NULL,
+  user_id uuid NOT NULL,
+  question text NOT NULL,
+  answer text NOT NULL,
+  ease smallint NOT NULL DEFAULT 250,
+  interval_days smallint NOT NULL DEFAULT 0,
+  repetitions smallint NOT NULL DEFAULT 0,
+  lapses smallint NOT NULL DEFAULT 0,
+  due_at timestamptz NOT NULL DEFAULT now(),
+  reviewed_at timestamptz NULL,
+  created_at timestamptz NOT NULL DEFAULT now(),
+  CONSTRAINT flashcards_pkey PRIMARY KEY (id),
+  CONSTRAINT flashcards_deck_id_fkey FOREIGN KEY (deck_id) REFERENCES public.flashcard_decks(id) ON DELETE CASCADE,
+  CONSTRAINT flashcards_user_id_fkey FOREIGN KEY (user_id) REFERENCES auth.users(id) ON DELETE CASCADE
+);
+
+-- The "due now" queue: /flashcards/due is a range scan on these.
+CREATE INDEX IF NOT EXISTS flashcards_user_id_due_at_idx
+ON public.flashcards (user_id, due_at);
+
+CREATE INDEX IF NOT EXISTS flashcards_deck_id_due_at_idx
+ON public.flashcards (deck_id, due_at);
+
+-- RLS policies
+ALTER TABLE public.flashcard_decks ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.flashcards ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view their own flashcard decks."
+ON public.flashcard_decks
+FOR SELECT USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can view their own flashcards."
+ON public.flashcards
+FOR SELECT USING (auth.uid() = user_id);
+
+
+-- Applies a batch of SM-2 review grades (0-5) and reschedules each card.
+-- p_reviews is a JSON array of {"card_id": ..., "grade": ...}. Returns the number of cards updated.
+-- p_user_id is trusted, so only the backend (service role) may call this; see the grants below.
+CREATE OR REPLACE FUNCTION public.review_flashcards(p_user_id uuid, p_reviews jsonb)
+RETURNS integer
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  updated_count integer;
+BEGIN
+  WITH reviews AS (
+    SELECT (r->>'card_id')::bigint AS card_id,
+           least(greatest((r->>'grade')::int, 0), 5) AS grade
+    FROM jsonb_array_elements(p_reviews) AS r
+  ),
+  next_state AS (
+    SELECT c.id,
+           -- EF' = EF + (0.1 - (5 - q) * (0.08 + (5 - q) * 0.02)), floored at 1.3
+           greatest(130, c.ease + 10 - (5 - rv.grade) * (8 + (5 - rv.grade) * 2)) AS ease,
+           CASE
+             WHEN rv.grade < 3 THEN 1
+             WHEN c.repetitions = 0 THEN 1
+             WHEN c.repetitions = 1 THEN 6
+             -- Widen before multiplying: smallint * smallint is computed as smallint and
+             -- overflows long before the clamp (e.g. 235 days * ease 250).
+             ELSE least(32767, round(c.interval_days::int * c.ease / 100.0))
+           END AS interval_days,
+           CASE WHEN rv.grade < 3 THEN 0 ELSE c.repetitions + 1 END AS repetitions,
+           CASE WHEN rv.grade < 3 THEN c.lapses + 1 ELSE c.lapses END AS lapses
+    FROM public.flashcards c
+    JOIN reviews rv ON rv.card_id = c.id
+    WHERE c.user_id = p_user_id
+  )
+  UPDATE public.flashcards c
+  SET ease = n.ease::smallint,
+      interval_days = n.interval_days::smallint,
+      repetitions = least(n.repetitions, 32767)::smallint,
+      lapses = least(n.lapses, 32767)::smallint,
+      due_at = now() + make_interval(days => n.interval_days::int),
+      reviewed_at = now()
+  FROM next_state n
+  WHERE c.id = n.id;
+
+  GET DIAGNOSTICS updated_count = ROW_COUNT;
+  RETURN updated_count;
+END;
+$$;
+
+-- Not callable from the browser through PostgREST; otherwise any signed-in user could
+-- pass someone else's p_user_id and reschedule their cards.
+REVOKE EXECUTE ON FUNCTION public.review_flashcards(uuid, jsonb) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.review_flashcards(uuid, jsonb) TO service_role;